@@ -0,0 +1,121 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import bump_version, get_version
+
+TOKEN_CACHE_KEY = 'auth_token:{}'
+USER_TOKENS_NAMESPACE = 'auth_user_{}'
+
+
+class TokenLRU:
+    """
+    Ограниченный по размеру кеш токенов в памяти процесса.
+
+    Запись живёт не дольше ttl секунд, при переполнении вытесняется
+    давно не использованная.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[1:]
+
+    def set(self, digest, user, token, generation):
+        with self._lock:
+            self._entries[digest] = (
+                time.monotonic() + self.ttl, user, token, generation)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for digest in [
+                    digest for digest, entry in self._entries.items()
+                    if entry[1].pk == user_id]:
+                del self._entries[digest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_lru = TokenLRU(
+    settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+
+def user_generation(user_id):
+    """Версия токенов пользователя в общем кеше или None без него."""
+    if not settings.AUTH_TOKEN_SHARED_CACHE:
+        return None
+    return get_version(USER_TOKENS_NAMESPACE.format(user_id))
+
+
+def invalidate_user_tokens(user_id):
+    """
+    Сбрасывает закешированные токены пользователя.
+
+    Локальный кеш очищается сразу, в остальных процессах записи
+    перестают совпадать по версии пользователя в общем кеше
+    (без общего кеша они истекают через AUTH_TOKEN_CACHE_TTL).
+    """
+    token_lru.discard_user(user_id)
+    if settings.AUTH_TOKEN_SHARED_CACHE:
+        bump_version(USER_TOKENS_NAMESPACE.format(user_id))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кешем токен -> пользователь.
+
+    Сначала проверяется кеш процесса, затем (при
+    AUTH_TOKEN_SHARED_CACHE) общий кеш Django, и только потом база
+    данных. Ключи кешей - SHA-256 токена, сам токен не хранится.
+    """
+
+    lru = token_lru
+
+    def authenticate_credentials(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+
+        cached = self.lru.get(digest)
+        if cached is not None:
+            user, token, generation = cached
+            if generation == user_generation(user.pk):
+                return copy.copy(user), token
+
+        shared_key = TOKEN_CACHE_KEY.format(digest)
+        if settings.AUTH_TOKEN_SHARED_CACHE:
+            cached = cache.get(shared_key)
+            if cached is not None:
+                user, token, generation = cached
+                if generation == user_generation(user.pk):
+                    self.lru.set(digest, user, token, generation)
+                    return copy.copy(user), token
+
+        user, token = super().authenticate_credentials(key)
+        generation = user_generation(user.pk)
+        self.lru.set(digest, user, token, generation)
+        if settings.AUTH_TOKEN_SHARED_CACHE:
+            cache.set(shared_key, (user, token, generation),
+                      settings.AUTH_TOKEN_CACHE_TTL)
+        return copy.copy(user), token
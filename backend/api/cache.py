@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Favorite, ShoppingList
+from users.models import Follow
+
+RECIPES_NAMESPACE = 'recipes'
+INGREDIENTS_NAMESPACE = 'ingredients'
+TAGS_NAMESPACE = 'tags'
+USER_FLAGS_KEY = 'user_flags:{}'
+FEED_PULLED_KEY = 'feed_pulled:{}'
+
+
+def version_key(namespace):
+    return f'{namespace}:version'
+
+
+def modified_key(namespace):
+    return f'{namespace}:modified'
+
+
+def get_version(namespace):
+    """
+    Возвращает текущую версию пространства ключей.
+
+    Если версия пропала из кеша, она начинается с текущего времени,
+    чтобы не совпасть ни с одной из уже выданных.
+    """
+    key = version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Делает устаревшими все ключи пространства за одну операцию."""
+    try:
+        cache.incr(version_key(namespace))
+    except ValueError:
+        get_version(namespace)
+    cache.set(modified_key(namespace), int(time.time()), None)
+
+
+def get_modified(namespace):
+    """Время последнего изменения пространства, секунды от эпохи."""
+    key = modified_key(namespace)
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, int(time.time()), None)
+        modified = cache.get(key)
+    return modified
+
+
+def request_cache_key(namespace, request):
+    """
+    Ключ ответа по пути и нормализованной строке запроса.
+
+    Порядок параметров и повторяющихся значений не важен.
+    """
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists())
+    raw = f'{request.get_host()}{request.path}?{params}'
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{namespace}:{get_version(namespace)}:{digest}'
+
+
+class CatalogueSnapshot:
+    """
+    Снимок справочника в памяти процесса.
+
+    Данные загружаются функцией load и перечитываются только
+    после смены версии пространства namespace.
+    """
+
+    def __init__(self, namespace, load):
+        self.namespace = namespace
+        self.load = load
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+
+    def get(self):
+        version = get_version(self.namespace)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._data = self.load()
+                    self._version = version
+        return self._data
+
+
+def get_user_flags(user):
+    """
+    Возвращает id избранных рецептов, рецептов в корзине и авторов,
+    на которых подписан пользователь. Наборы кешируются на пользователя.
+    """
+    if user.is_anonymous:
+        return {'favorites': set(), 'cart': set(), 'following': set()}
+
+    key = USER_FLAGS_KEY.format(user.id)
+    flags = cache.get(key)
+    if flags is None:
+        flags = {
+            'favorites': set(Favorite.objects.filter(
+                user=user).values_list('recipe_id', flat=True)),
+            'cart': set(ShoppingList.objects.filter(
+                user=user).values_list('recipe_id', flat=True)),
+            'following': set(Follow.objects.filter(
+                user=user).values_list('following_id', flat=True)),
+        }
+        cache.set(key, flags, settings.USER_FLAGS_CACHE_TIMEOUT)
+    return flags
+
+
+def invalidate_user_flags(user_id):
+    cache.delete(USER_FLAGS_KEY.format(user_id))
+
+
+def personalize(data, flags):
+    """
+    Накладывает флаги пользователя на общий ответ с рецептами:
+    is_favorited, is_in_shopping_cart и author.is_subscribed.
+    """
+    recipes = data['results'] if 'results' in data else [data]
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in flags['favorites']
+        recipe['is_in_shopping_cart'] = recipe['id'] in flags['cart']
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in flags['following'])
+    return data
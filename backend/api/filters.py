@@ -1,9 +1,12 @@
 from distutils.util import strtobool
-from django_filters.rest_framework import FilterSet
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters import rest_framework
 
-from recipes.models import Favorite, Recipe, ShoppingList, Ingredient
-from recipes.models import Tag
+from recipes.models import Favorite, Recipe, ShoppingList
+from recipes.models import SEARCH_CONFIG, Tag
+from .cache import TAGS_NAMESPACE, CatalogueSnapshot
 
 CHOICES_LIST = (
     ('0', 'False'),
@@ -11,6 +14,15 @@ CHOICES_LIST = (
 )
 
 
+tag_ids_by_slug = CatalogueSnapshot(
+    TAGS_NAMESPACE,
+    lambda: dict(Tag.objects.values_list('slug', 'id')))
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_ids_by_slug.get()]
+
+
 class RecipeFilter(rest_framework.FilterSet):
     is_favorited = rest_framework.ChoiceFilter(
         choices=CHOICES_LIST,
@@ -24,47 +36,66 @@ class RecipeFilter(rest_framework.FilterSet):
         field_name='author',
         lookup_expr='exact'
     )
-    tags = rest_framework.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    tags = rest_framework.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='tags_method'
     )
-
-    def is_favorited_method(self, queryset, name, value):
+    search = rest_framework.CharFilter(method='search_method')
+
+    def tags_method(self, queryset, name, value):
+        """
+        Рецепты хотя бы с одним из тегов.
+
+        Слаги переводятся в id по снимку справочника в памяти процесса,
+        условие проверяется по массиву Recipe.tag_ids без JOIN и DISTINCT.
+        """
+        slugs = tag_ids_by_slug.get()
+        return queryset.filter(
+            tag_ids__overlap=[slugs[slug] for slug in value])
+
+    def search_method(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию с русской
+        морфологией и нечёткий поиск по названию через триграммы.
+
+        Результаты упорядочены по релевантности.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        return queryset.annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            similarity=TrigramSimilarity('name', value),
+        ).filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).order_by('-search_rank', '-similarity', '-pub_date')
+
+    def filter_by_user_relation(self, queryset, annotation, model, value):
+        """
+        Фильтрует рецепты коррелированным подзапросом EXISTS по связи
+        пользователя с рецептом (избранное или список покупок).
+
+        Если get_queryset уже аннотировал флаг, используется он.
+        """
         if self.request.user.is_anonymous:
-            return Recipe.objects.none()
+            return queryset if not strtobool(value) else queryset.none()
 
-        favorites = Favorite.objects.filter(user=self.request.user)
-        recipes = [item.recipe.id for item in favorites]
-        new_queryset = queryset.filter(id__in=recipes)
+        if annotation not in queryset.query.annotations:
+            queryset = queryset.annotate(**{annotation: Exists(
+                model.objects.filter(
+                    user=self.request.user, recipe=OuterRef('pk')))})
+        return queryset.filter(**{annotation: bool(strtobool(value))})
 
-        if not strtobool(value):
-            return queryset.difference(new_queryset)
-
-        return queryset.filter(id__in=recipes)
+    def is_favorited_method(self, queryset, name, value):
+        return self.filter_by_user_relation(
+            queryset, 'is_favorited', Favorite, value)
 
     def is_in_shopping_cart_method(self, queryset, name, value):
-        if self.request.user.is_anonymous:
-            return Recipe.objects.none()
-
-        shopping_cart = ShoppingList.objects.filter(user=self.request.user)
-        recipes = [item.recipe.id for item in shopping_cart]
-        new_queryset = queryset.filter(id__in=recipes)
-
-        if not strtobool(value):
-            return queryset.difference(new_queryset)
-
-        return queryset.filter(id__in=recipes)
+        return self.filter_by_user_relation(
+            queryset, 'is_in_shopping_cart', ShoppingList, value)
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags')
-
-
-class IngredientFilter(FilterSet):
-    name = rest_framework.CharFilter(
-        field_name="name", lookup_expr='icontains')
-
-    class Meta:
-        model = Ingredient
-        fields = ('name', )
+        fields = ('author', 'tags', 'search')
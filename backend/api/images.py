@@ -0,0 +1,109 @@
+import base64
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps
+
+from jobs.registry import enqueue, task
+from recipes.models import Recipe
+from .cache import RECIPES_NAMESPACE, bump_version
+
+# Имя варианта -> максимальная сторона в пикселях.
+RENDITIONS = {
+    'thumbnail': 320,
+    'detail': 1080,
+}
+RENDITION_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True,
+             'progressive': True},
+}
+PLACEHOLDER_SIZE = 16
+RENDITIONS_DIR = 'recipes/renditions'
+
+
+def prepare(image):
+    """
+    Поворачивает снимок по EXIF и возвращает RGB-копию без метаданных.
+
+    Новое изображение собирается только из пикселей, поэтому EXIF,
+    ICC-профиль и комментарии в варианты не попадают.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    clean = Image.new('RGB', image.size)
+    clean.paste(image.convert('RGB'))
+    return clean
+
+
+def make_placeholder(image):
+    """Крошечное размытое превью в виде data URI."""
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, format='JPEG', quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+@task
+def build_renditions(recipe_id):
+    """
+    Строит варианты изображения рецепта и сохраняет их пути.
+
+    Результат пишется в Recipe.image_renditions, только если
+    изображение рецепта не сменилось за время обработки.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only('id', 'image').first()
+    if recipe is None or not recipe.image:
+        return None
+
+    source = recipe.image.name
+    with recipe.image.open('rb') as file:
+        image = prepare(Image.open(file))
+
+    renditions = {'source': source, 'placeholder': make_placeholder(image)}
+    for name, size in RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        renditions[name] = {}
+        for extension, options in RENDITION_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, **options)
+            path = default_storage.save(
+                f'{RENDITIONS_DIR}/{name}.{extension}',
+                ContentFile(buffer.getvalue()))
+            renditions[name][extension] = path
+
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_renditions=renditions)
+    if updated:
+        bump_version(RECIPES_NAMESPACE)
+    return renditions
+
+
+def schedule_renditions(recipe_id):
+    """Ставит построение вариантов изображения в очередь задач."""
+    enqueue(build_renditions, recipe_id)
+
+
+def rendition_urls(recipe, request=None):
+    """URL вариантов изображения для ответа API."""
+    renditions = recipe.image_renditions or {}
+    if renditions.get('source') != recipe.image.name:
+        return None, None
+    images = {}
+    for name in RENDITIONS:
+        images[name] = {}
+        for extension, path in renditions.get(name, {}).items():
+            url = default_storage.url(path)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            images[name][extension] = url
+    return images, renditions.get('placeholder')
@@ -0,0 +1,144 @@
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from jobs.registry import enqueue
+from recipes.counters import change_counter
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    Tag)
+from recipes.tasks import fan_out_recipes
+from users.models import UserFoodGram
+from .cache import RECIPES_NAMESPACE, bump_version
+from .images import schedule_renditions
+from .serializers import RecipeBulkSerializer
+
+
+def parse_lines(stream):
+    """
+    Разбирает NDJSON построчно.
+
+    Отдаёт тройки (номер строки, данные, ошибки), пустые строки
+    пропускаются, но учитываются в нумерации.
+    """
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as error:
+            yield number, None, {
+                'non_field_errors': [f'Некорректный JSON: {error}']}
+
+
+def batch_ingredient_ids(items):
+    """Существующие id ингредиентов, упомянутых в пачке строк."""
+    ids = set()
+    for _, data, _ in items:
+        if not isinstance(data, dict):
+            continue
+        ingredients = data.get('ingredients')
+        if not isinstance(ingredients, list):
+            continue
+        for ingredient in ingredients:
+            if isinstance(ingredient, dict) and isinstance(
+                    ingredient.get('id'), int):
+                ids.add(ingredient['id'])
+    return set(Ingredient.objects.filter(pk__in=ids).values_list(
+        'pk', flat=True))
+
+
+@transaction.atomic
+def save_recipes(author, validated):
+    """
+    Сохраняет проверенные рецепты пачкой.
+
+    Рецепты, связи с тегами и ингредиенты вставляются через
+    bulk_create, поэтому сигналы не срабатывают: tag_ids заполняется
+    сразу, счётчик рецептов автора обновляется, а раскладка по лентам
+    подписчиков и обработка изображений ставятся в очередь явно.
+    Поисковый вектор заполняет триггер в базе данных.
+    """
+    recipes = []
+    for data in validated:
+        fields = {
+            key: value for key, value in data.items()
+            if key not in ('tags', 'ingredients')}
+        recipes.append(Recipe(
+            author=author,
+            tag_ids=sorted({tag.id for tag in data['tags']}),
+            **fields))
+    Recipe.objects.bulk_create(recipes)
+
+    recipe_tags = Recipe.tags.through
+    recipe_tags.objects.bulk_create(
+        recipe_tags(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe, data in zip(recipes, validated)
+        for tag in data['tags'])
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe_id=recipe.id,
+                         ingredient_id=ingredient['id'],
+                         amount=ingredient['amount'])
+        for recipe, data in zip(recipes, validated)
+        for ingredient in data['ingredients'])
+
+    enqueue(fan_out_recipes, author.id, [recipe.id for recipe in recipes])
+    for recipe in recipes:
+        if recipe.image:
+            schedule_renditions(recipe.id)
+    change_counter(UserFoodGram, author.id, 'recipes_count', len(recipes))
+    return recipes
+
+
+def ingest_recipes(stream, author, context):
+    """
+    Загружает рецепты из потока NDJSON и отдаёт результат по строкам.
+
+    Строки читаются пачками по RECIPE_BULK_BATCH_SIZE, каждая
+    проверяется с правилами RecipeChangeSerializer, корректные рецепты
+    пачки сохраняются в одной транзакции. Для каждой строки
+    возвращается {"line", "id"} или {"line", "errors"}.
+    """
+    tags = Tag.objects.in_bulk()
+    lines = parse_lines(stream)
+    while True:
+        items = list(islice(lines, settings.RECIPE_BULK_BATCH_SIZE))
+        if not items:
+            return
+
+        batch_context = {
+            **context,
+            'tags': tags,
+            'ingredient_ids': batch_ingredient_ids(items)}
+        results, valid = {}, []
+        for number, data, errors in items:
+            if errors is None:
+                serializer = RecipeBulkSerializer(
+                    data=data, context=batch_context)
+                if serializer.is_valid():
+                    valid.append((number, serializer.validated_data))
+                    continue
+                errors = serializer.errors
+            results[number] = {'line': number, 'errors': errors}
+
+        if valid:
+            try:
+                recipes = save_recipes(
+                    author, [data for _, data in valid])
+            except DatabaseError as error:
+                for number, _ in valid:
+                    results[number] = {'line': number, 'errors': {
+                        'non_field_errors': [
+                            f'Пачка не сохранена: {error}']}}
+            else:
+                for (number, _), recipe in zip(valid, recipes):
+                    results[number] = {'line': number, 'id': recipe.id}
+                bump_version(RECIPES_NAMESPACE)
+
+        for number in sorted(results):
+            yield json.dumps(results[number], ensure_ascii=False) + '\n'
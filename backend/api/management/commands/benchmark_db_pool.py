@@ -0,0 +1,126 @@
+import io
+import threading
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from rest_framework.authtoken.models import Token
+
+from foodgram.db.pool import get_pool
+
+
+class Command(BaseCommand):
+    help = ('Измеряет число запросов в секунду к API с пулом соединений '
+            'и без него. Запросы проходят через WSGI-обработчик Django, '
+            'поэтому соединение закрывается (или возвращается в пул) '
+            'в конце каждого запроса, как под gunicorn.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/users/me/')
+        parser.add_argument(
+            '--token', help='Токен для заголовка Authorization, по '
+                            'умолчанию любой существующий.')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def environ(self, path, token):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.url_scheme': 'http',
+        }
+        if token:
+            environ['HTTP_AUTHORIZATION'] = f'Token {token}'
+        return environ
+
+    def run(self, handler, options):
+        statuses = {}
+        lock = threading.Lock()
+        remaining = [options['requests']]
+
+        def start_response(status, headers, exc_info=None):
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+        def worker():
+            while True:
+                with lock:
+                    if not remaining[0]:
+                        break
+                    remaining[0] -= 1
+                response = handler(
+                    self.environ(options['path'], options['token']),
+                    start_response)
+                for _ in response:
+                    pass
+                response.close()
+            connections.close_all()
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, statuses
+
+    def handle(self, *args, **options):
+        if not hasattr(connection, 'pool'):
+            raise CommandError(
+                'Нужен бэкенд foodgram.db (ENGINE в DATABASES).')
+        if connection.settings_dict['CONN_MAX_AGE'] != 0:
+            self.stdout.write(self.style.WARNING(
+                'CONN_MAX_AGE не 0: соединения переиспользуются и без '
+                'пула, разница будет меньше.'))
+
+        if not options['token']:
+            token = Token.objects.first()
+            if token is None:
+                raise CommandError('Нет ни одного токена, укажите --token.')
+            options['token'] = token.key
+            connection.close()
+
+        handler = WSGIHandler()
+        pool = get_pool(
+            connection.alias, connection.get_connection_params())
+        enabled = pool.enabled
+        pool.max_size = max(pool.max_size, options['concurrency'])
+        results = {}
+        try:
+            for mode in (False, True):
+                pool.enabled = mode
+                pool.close_idle()
+                before = pool.stats()
+                elapsed, statuses = self.run(handler, options)
+                after = pool.stats()
+                results[mode] = options['requests'] / elapsed
+                label = 'с пулом' if mode else 'без пула'
+                self.stdout.write(
+                    f'{label}: {results[mode]:.0f} запросов/с, '
+                    f'{elapsed:.2f} с, ответы {statuses}')
+                if mode:
+                    counters = {
+                        name: after[name] - before[name]
+                        for name in ('checkouts', 'reuses', 'connects',
+                                     'waits', 'recycles', 'failed_checks')}
+                    self.stdout.write(f'  счётчики пула: {counters}')
+                    if not counters['checkouts']:
+                        self.stdout.write(self.style.WARNING(
+                            f'{options["path"]} не обращается к базе '
+                            f'данных, выберите другой --path.'))
+        finally:
+            pool.enabled = enabled
+            pool.close_idle()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: {results[True] / results[False]:.2f}x'))
@@ -0,0 +1,152 @@
+import time
+from distutils.util import strtobool
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.filters import RecipeFilter
+from recipes.models import Favorite, Recipe, ShoppingList, Tag
+from users.models import UserFoodGram
+
+
+class LegacyRecipeFilter(RecipeFilter):
+    """Прежняя реализация фильтров через список id и difference()."""
+
+    def is_favorited_method(self, queryset, name, value):
+        if self.request.user.is_anonymous:
+            return Recipe.objects.none()
+
+        favorites = Favorite.objects.filter(user=self.request.user)
+        recipes = [item.recipe.id for item in favorites]
+        new_queryset = queryset.filter(id__in=recipes)
+
+        if not strtobool(value):
+            return queryset.difference(new_queryset)
+
+        return queryset.filter(id__in=recipes)
+
+    def is_in_shopping_cart_method(self, queryset, name, value):
+        if self.request.user.is_anonymous:
+            return Recipe.objects.none()
+
+        shopping_cart = ShoppingList.objects.filter(user=self.request.user)
+        recipes = [item.recipe.id for item in shopping_cart]
+        new_queryset = queryset.filter(id__in=recipes)
+
+        if not strtobool(value):
+            return queryset.difference(new_queryset)
+
+        return queryset.filter(id__in=recipes)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class FakeRequest:
+    def __init__(self, user):
+        self.user = user
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает прежние и новые фильтры is_favorited и '
+            'is_in_shopping_cart на сгенерированных данных. '
+            'Данные создаются в транзакции и откатываются.')
+
+    cases = (
+        {'is_favorited': '1'},
+        {'is_favorited': '0'},
+        {'is_in_shopping_cart': '1'},
+        {'is_favorited': '1', 'tags': ['bench-0']},
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--favorites', type=int, default=3000)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def seed(self, options):
+        author = UserFoodGram.objects.create(
+            username='bench-author', email='bench-author@example.com')
+        user = UserFoodGram.objects.create(
+            username='bench-user', email='bench-user@example.com')
+        # Теги создаются по одному, чтобы сигнал сдвинул версию снимка
+        # тегов, а tag_ids заполняется сразу, как при загрузке рецептов
+        # пачкой (api/ingest.py): bulk_create не отправляет m2m_changed.
+        tags = [
+            Tag.objects.create(
+                name=f'bench-{i}', color=f'#bench{i}', slug=f'bench-{i}')
+            for i in range(3)]
+        created = Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'Рецепт {i}', text='Описание',
+                    cooking_time=10, tag_ids=[tags[i % 3].id])
+             for i in range(options['recipes'])), batch_size=5000)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+             for recipe in created for tag_id in recipe.tag_ids),
+            batch_size=5000)
+        recipes = [recipe.id for recipe in created]
+        Favorite.objects.bulk_create(
+            (Favorite(user=user, recipe_id=recipe_id)
+             for recipe_id in recipes[:options['favorites']]),
+            batch_size=5000)
+        ShoppingList.objects.bulk_create(
+            (ShoppingList(user=user, recipe_id=recipe_id)
+             for recipe_id in recipes[::7][:options['favorites']]),
+            batch_size=5000)
+        return user, author
+
+    def measure(self, filterset_class, data, request, author, options):
+        best, queries, total = None, 0, 0
+        for _ in range(options['repeat']):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                filterset = filterset_class(
+                    data, Recipe.objects.filter(author=author),
+                    request=request)
+                if not filterset.is_valid():
+                    raise CommandError(
+                        f'{data}: фильтр отклонил параметры: '
+                        f'{filterset.errors.as_json()}')
+                queryset = filterset.qs
+                total = queryset.count()
+                list(queryset[:options['page_size']])
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            queries = counter.count
+        return best, queries, total
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user, author = self.seed(options)
+                request = FakeRequest(user)
+                for data in self.cases:
+                    old = self.measure(
+                        LegacyRecipeFilter, data, request, author, options)
+                    new = self.measure(
+                        RecipeFilter, data, request, author, options)
+                    if old[2] != new[2] or not new[2]:
+                        raise CommandError(
+                            f'{data}: прежний фильтр нашёл {old[2]}, '
+                            f'новый {new[2]} рецептов, сравнение '
+                            f'времени не имеет смысла.')
+                    self.stdout.write(
+                        f'{data}, {new[2]} рецептов: '
+                        f'прежний {old[0] * 1000:.1f} мс '
+                        f'({old[1]} запросов), новый {new[0] * 1000:.1f} мс '
+                        f'({new[1]} запросов)')
+                raise Rollback
+        except Rollback:
+            pass
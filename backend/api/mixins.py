@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_modified, get_version
+
+
+class ConditionalCatalogueMixin:
+    """
+    Условные GET-запросы для справочников.
+
+    ETag и Last-Modified строятся по версии пространства
+    catalogue_namespace, поэтому ответ 304 отдаётся без обращения
+    к базе данных. Аутентификация выполняется лениво: чтение
+    справочника не требует пользователя и не ходит за токеном.
+    """
+
+    catalogue_namespace = None
+
+    def perform_authentication(self, request):
+        pass
+
+    def get_validators(self):
+        version = get_version(self.catalogue_namespace)
+        etag = f'"{self.catalogue_namespace}-{version}"'
+        return etag, get_modified(self.catalogue_namespace)
+
+    def is_not_modified(self, request, etag, modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            tags = {tag.strip() for tag in if_none_match.split(',')}
+            return '*' in tags or etag in tags or f'W/{etag}' in tags
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and modified <= if_modified_since
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, modified = self.get_validators()
+        if self.is_not_modified(request, etag, modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        response['Cache-Control'] = (
+            f'public, max-age={settings.CATALOGUE_CACHE_MAX_AGE}')
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
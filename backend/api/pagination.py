@@ -1,7 +1,186 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
-    """Пагинатор проекта."""
+    """
+    Пагинатор проекта.
+
+    По умолчанию работает по номерам страниц. Если у наследника задан
+    ordering, то запрос с параметром ?cursor= (или ?pagination=cursor
+    для первой страницы) переключает его в режим курсора: страница
+    выбирается по ключу сортировки без OFFSET и без COUNT(*).
+
+    Параметры из cursor_conflicts задают свою сортировку (например,
+    по релевантности поиска), запрос курсора с ними получает 400.
+    """
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    ordering = None
+    cursor_by_default = False
+    cursor_conflicts = ()
+    invalid_cursor_message = 'Некорректный курсор.'
+    cursor_conflict_message = (
+        'Курсорная пагинация недоступна вместе с параметром {}.')
+
+    def use_cursor(self, request):
+        return self.ordering is not None and (
+            self.cursor_by_default
+            or self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_mode = self.use_cursor(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        for param in self.cursor_conflicts:
+            if param in request.query_params:
+                raise exceptions.ValidationError({
+                    self.mode_query_param: [
+                        self.cursor_conflict_message.format(param)]})
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        position, reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else position is not None
+        self.page_results = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page_results:
+            return None
+        return self.encode_cursor(self.page_results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_results:
+            return None
+        return self.encode_cursor(self.page_results[0], reverse=True)
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, position):
+        """
+        Условие "строго после позиции" для составного ключа сортировки:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, obj, reverse):
+        position = [
+            str(getattr(obj, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'p': position, 'r': int(reverse)})
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        """
+        Позиция и направление из курсора.
+
+        Каждое значение позиции приводится к типу своего поля модели,
+        поэтому подделанный курсор даёт 404, а не ошибку в запросе.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values, reverse = payload['p'], payload['r']
+            if (not isinstance(values, list)
+                    or len(values) != len(self.ordering)
+                    or reverse not in (0, 1)):
+                raise ValueError
+            position = []
+            for field, value in zip(self.ordering, values):
+                if not isinstance(value, str):
+                    raise ValueError
+                value = model._meta.get_field(
+                    field.lstrip('-')).to_python(value)
+                if value is None:
+                    raise ValueError
+                position.append(value)
+            return position, bool(reverse)
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError,
+                ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class RecipePagination(CustomPagination):
+    """
+    Пагинатор рецептов, курсор по (pub_date, id).
+
+    Поиск сортирует по релевантности, поэтому с ?search= курсор
+    не используется.
+    """
+    ordering = ('-pub_date', '-id')
+    cursor_conflicts = ('search',)
+
+
+class UserPagination(CustomPagination):
+    """Пагинатор пользователей, курсор по (date_joined, id)."""
+    ordering = ('-date_joined', '-id')
+
+
+class FollowPagination(CustomPagination):
+    """Пагинатор подписок, курсор по id подписки."""
+    ordering = ('-id',)
+
+
+class FeedPagination(CustomPagination):
+    """Пагинатор ленты подписок, всегда курсор по (pub_date, recipe_id)."""
+    ordering = ('-pub_date', '-recipe_id')
+    cursor_by_default = True
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db.models import Count
+
+from recipes.models import Ingredient
+from .cache import INGREDIENTS_NAMESPACE, bump_version, get_version
+
+
+def normalize(value):
+    """Приводит строку к виду для поиска: регистр и ё/е не важны."""
+    return value.casefold().replace('ё', 'е')
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+IndexSnapshot = namedtuple(
+    'IndexSnapshot', 'version built_at items names trie trigrams')
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Префиксное дерево находит названия, начинающиеся с запроса,
+    триграммный индекс - названия, содержащие запрос. Индекс строится
+    один раз и перестраивается, когда меняется версия каталога
+    в кеше или истекает INGREDIENT_INDEX_TTL.
+
+    Все части индекса лежат в одном неизменяемом IndexSnapshot, который
+    подменяется одним присваиванием. Поиск берёт ссылку на снимок один
+    раз, поэтому перестройка в другом потоке не смешивает старые и
+    новые данные.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = IndexSnapshot(None, 0, (), (), {}, {})
+
+    @staticmethod
+    def _build(version):
+        use_frequency = getattr(
+            settings, 'INGREDIENT_SEARCH_USE_FREQUENCY', True)
+        queryset = Ingredient.objects.order_by('name')
+        if use_frequency:
+            queryset = queryset.annotate(usage=Count('recipeingredient'))
+        rows = list(queryset)
+
+        rows.sort(key=lambda row: -getattr(row, 'usage', 0))
+        items = tuple(
+            {'id': row.id,
+             'name': row.name,
+             'measurement_unit': row.measurement_unit}
+            for row in rows)
+        names = tuple(normalize(row.name) for row in rows)
+
+        trie = {}
+        posting = defaultdict(set)
+        for position, name in enumerate(names):
+            node = trie
+            for char in name:
+                node = node.setdefault(char, {})
+                node.setdefault(None, []).append(position)
+            for trigram in trigrams(name):
+                posting[trigram].add(position)
+
+        return IndexSnapshot(
+            version, time.monotonic(), items, names, trie, dict(posting))
+
+    def _is_fresh(self, snapshot, version):
+        ttl = getattr(settings, 'INGREDIENT_INDEX_TTL', 300)
+        return (version == snapshot.version
+                and time.monotonic() - snapshot.built_at < ttl)
+
+    def _ensure_fresh(self):
+        """Возвращает актуальный снимок индекса."""
+        version = get_version(INGREDIENTS_NAMESPACE)
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, version):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if not self._is_fresh(snapshot, version):
+                snapshot = self._build(version)
+                self._snapshot = snapshot
+            return snapshot
+
+    @staticmethod
+    def _prefix_matches(snapshot, query):
+        node = snapshot.trie
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node[None]
+
+    @staticmethod
+    def _substring_matches(snapshot, query, exclude):
+        names = snapshot.names
+        if len(query) < 3:
+            candidates = range(len(names))
+        else:
+            postings = sorted(
+                (snapshot.trigrams.get(trigram, set())
+                 for trigram in trigrams(query)), key=len)
+            candidates = sorted(set.intersection(*postings))
+        return [
+            position for position in candidates
+            if position not in exclude and query in names[position]]
+
+    def search(self, query=''):
+        """
+        Возвращает ингредиенты, подходящие под запрос.
+
+        Сначала идут совпадения по началу названия, затем по подстроке;
+        внутри групп - по частоте использования в рецептах и алфавиту.
+        """
+        snapshot = self._ensure_fresh()
+        query = normalize(query.strip())
+        if not query:
+            return list(snapshot.items)
+
+        prefix = self._prefix_matches(snapshot, query)
+        substring = self._substring_matches(snapshot, query, set(prefix))
+        return [snapshot.items[position] for position in prefix + substring]
+
+    @staticmethod
+    def invalidate():
+        """Сдвигает версию каталога, индексы всех процессов устаревают."""
+        bump_version(INGREDIENTS_NAMESPACE)
+
+
+ingredient_index = IngredientIndex()
@@ -1,5 +1,7 @@
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
+from .images import rendition_urls
 from .service import Base64ImageField
 
 from recipes.models import (
@@ -7,6 +9,7 @@ from recipes.models import (
     Ingredient,
     Recipe,
     RecipeIngredient,
+    ShoppingCartIngredient,
     ShoppingList,
     Tag)
 from users.serializers import CustomUserSerializer
@@ -53,8 +56,22 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='get_is_in_shopping_cart')
     image = Base64ImageField()
+    images = serializers.SerializerMethodField(method_name='get_images')
+    image_placeholder = serializers.SerializerMethodField(
+        method_name='get_image_placeholder')
+
+    def get_images(self, obj):
+        images, _ = rendition_urls(obj, self.context.get('request'))
+        return images
+
+    def get_image_placeholder(self, obj):
+        _, placeholder = rendition_urls(obj)
+        return placeholder
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+
         user = self.context['request'].user
 
         if user.is_anonymous:
@@ -63,6 +80,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         return Favorite.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+
         user = self.context['request'].user
 
         if user.is_anonymous:
@@ -71,7 +91,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         return ShoppingList.objects.filter(user=user, recipe=obj).exists()
 
     def get_ingredients(self, obj):
-        ingredient = RecipeIngredient.objects.filter(recipe=obj)
+        ingredient = obj.recipe_ingredients.all()
         serializer = RecipeIngredientSerializer(ingredient, many=True)
         return serializer.data
 
@@ -82,6 +102,8 @@ class RecipeSerializer(serializers.ModelSerializer):
             'author',
             'name',
             'image',
+            'images',
+            'image_placeholder',
             'text',
             'ingredients',
             'tags',
@@ -112,25 +134,21 @@ class RecipeChangeSerializer(serializers.ModelSerializer):
     cooking_time = serializers.IntegerField(min_value=1)
     image = Base64ImageField()
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
 
         recipe = Recipe.objects.create(**validated_data)
-
-        for tag in tags:
-            recipe.tags.add(tag)
-
-        recipe_ingredients = []
-        for ingredient in ingredients:
-            recipe_ingredients.append(RecipeIngredient(
-                recipe=recipe,
-                ingredient=get_object_or_404(Ingredient, pk=ingredient['id']),
-                amount=ingredient['amount']))
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        recipe.tags.add(*tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient['id'],
+                             amount=ingredient['amount'])
+            for ingredient in ingredients)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
@@ -147,41 +165,89 @@ class RecipeChangeSerializer(serializers.ModelSerializer):
             instance.tags.set(tags)
 
         if ingredients:
-            RecipeIngredient.objects.filter(recipe=instance).delete()
-            recipe_ingredients = []
-            for ingredient in ingredients:
-                recipe_ingredients.append(RecipeIngredient(
-                    recipe=instance,
-                    ingredient=get_object_or_404(Ingredient,
-                                                 pk=ingredient['id']),
-                    amount=ingredient['amount']
-                ))
-            RecipeIngredient.objects.bulk_create(recipe_ingredients)
+            self.update_ingredients(instance, {
+                ingredient['id']: ingredient['amount']
+                for ingredient in ingredients})
         return instance
 
-    def validate(self, data):
-        if len(data['tags']) == 0:
-            raise serializers.ValidationError('Укажите хотя бы один тег.')
+    @staticmethod
+    def update_ingredients(recipe, amounts):
+        """
+        Приводит состав рецепта к amounts = {id ингредиента: количество}.
+
+        Меняются только отличающиеся строки: новые вставляются,
+        изменённые обновляются, лишние удаляются, каждое действие
+        одним запросом. Изменение переносится в списки покупок.
+        """
+        existing = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)}
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in existing.items()}
+
+        removed = set(existing) - set(amounts)
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            item = existing.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+
+        added = [
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing]
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+
+        if removed or changed or added:
+            ShoppingCartIngredient.objects.change_recipe(
+                recipe, old_amounts, amounts)
 
-        if len(set(data['tags'])) != len(data['tags']):
-            raise serializers.ValidationError('Теги не должны повторяться.')
+    def validate(self, data):
+        if 'tags' in data:
+            if len(data['tags']) == 0:
+                raise serializers.ValidationError(
+                    'Укажите хотя бы один тег.')
+            if len(set(data['tags'])) != len(data['tags']):
+                raise serializers.ValidationError(
+                    'Теги не должны повторяться.')
 
-        if data.get('cooking_time', 0) < 1:
+        if 'cooking_time' in data and data['cooking_time'] < 1:
             raise serializers.ValidationError(
                 'Минимальное время приготовления 1 минута.')
 
-        if len(data['ingredients']) < 1:
-            raise serializers.ValidationError(
-                'Укажите хотя бы один ингредиент.')
-        ingredients_id = set()
-        for ingredient in data['ingredients']:
-            if ingredient['id'] in ingredients_id:
-                raise serializers.ValidationError(
-                    'Ингредиенты не должны повторяться.')
-            ingredients_id.add(ingredient['id'])
+        if 'ingredients' in data:
+            self.validate_ingredient_ids(data['ingredients'])
 
         return data
 
+    def validate_ingredient_ids(self, ingredients):
+        """Проверяет повторы и существование ингредиентов одним запросом."""
+        if len(ingredients) < 1:
+            raise serializers.ValidationError(
+                'Укажите хотя бы один ингредиент.')
+        ingredients_id = [ingredient['id'] for ingredient in ingredients]
+        if len(set(ingredients_id)) != len(ingredients_id):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться.')
+        found = self.context.get('ingredient_ids')
+        if found is None:
+            found = Ingredient.objects.in_bulk(ingredients_id)
+        missing = [pk for pk in ingredients_id if pk not in found]
+        if missing:
+            raise serializers.ValidationError({
+                'ingredients': 'Ингредиенты не найдены: '
+                               + ', '.join(map(str, missing))})
+
     class Meta:
         model = Recipe
         fields = (
@@ -195,6 +261,35 @@ class RecipeChangeSerializer(serializers.ModelSerializer):
             'cooking_time')
 
 
+class RecipeBulkSerializer(RecipeChangeSerializer):
+    """
+    Сериализатор строки массовой загрузки рецептов.
+
+    Теги и ингредиенты проверяются по справочникам из context
+    ('tags' - {id: Tag}, 'ingredient_ids' - множество id), которые
+    загружаются один раз на пачку строк, а не на каждый рецепт.
+    """
+
+    tags = serializers.ListField(child=serializers.IntegerField())
+
+    def validate_tags(self, value):
+        tags = self.context['tags']
+        missing = [pk for pk in value if pk not in tags]
+        if missing:
+            raise serializers.ValidationError(
+                'Теги не найдены: ' + ', '.join(map(str, missing)))
+        return [tags[pk] for pk in value]
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления и удаления."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BULK_TOGGLE_LIMIT)
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     """Сериализтор для списка избранного."""
     class Meta:
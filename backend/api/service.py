@@ -1,31 +1,127 @@
-from recipes.models import Recipe, RecipeIngredient, ShoppingList
-from django.core.files.base import ContentFile
 import base64
+import csv
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F
 from rest_framework import serializers
 
+from recipes.models import ShoppingCartIngredient
+
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_PDF_ROWS_PER_PAGE = 40
+SHOPPING_LIST_PDF_CHUNK_SIZE = 64 * 1024
+
+
+def get_shopping_list_ingredients(user):
+    """
+    Возвращает суммарные ингредиенты из списка покупок пользователя.
+
+    Суммы хранятся в ShoppingCartIngredient и обновляются при изменении
+    корзины, поэтому выгрузка читает несколько строк по индексу.
+    """
+    return ShoppingCartIngredient.objects.filter(user=user).values(
+        'ingredient__name', 'ingredient__measurement_unit',
+        total_amount=F('amount')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def format_amount(amount):
+    """Убирает дробную часть у целых значений количества."""
+    if float(amount).is_integer():
+        return int(amount)
+    return round(amount, 2)
+
+
+def iter_shopping_list_rows(user):
+    """
+    Отдаёт строки списка покупок по одной.
+
+    На PostgreSQL iterator() читает результат серверным курсором,
+    поэтому память не растёт вместе с размером списка.
+    """
+    ingredients = get_shopping_list_ingredients(user).iterator(
+        chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+    for item in ingredients:
+        yield (
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            format_amount(item['total_amount']))
+
+
+def stream_shopping_list_txt(user):
+    for name, unit, amount in iter_shopping_list_rows(user):
+        yield f'{name} ({unit}): {amount}\n'
+
+
+class Echo:
+    """Файлоподобный объект, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def stream_shopping_list_csv(user):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for row in iter_shopping_list_rows(user):
+        yield writer.writerow(row)
+
+
+def stream_shopping_list_pdf(user):
+    """
+    Формирует постраничный PDF со списком покупок.
+
+    Строки читаются курсором, но reportlab держит документ в памяти до
+    save(), поэтому память растёт вместе со списком. Готовый документ
+    отдаётся частями по SHOPPING_LIST_PDF_CHUNK_SIZE байт.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    font = 'Helvetica'
+    font_path = getattr(settings, 'SHOPPING_LIST_PDF_FONT', None)
+    if font_path and os.path.exists(font_path):
+        pdfmetrics.registerFont(TTFont('ShoppingListFont', font_path))
+        font = 'ShoppingListFont'
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    page, line = 1, 0
+
+    def start_page():
+        pdf.setFont(font, 14)
+        pdf.drawString(40, height - 50, f'Список покупок — стр. {page}')
+        pdf.setFont(font, 11)
+
+    start_page()
+    for name, unit, amount in iter_shopping_list_rows(user):
+        if line == SHOPPING_LIST_PDF_ROWS_PER_PAGE:
+            pdf.showPage()
+            page, line = page + 1, 0
+            start_page()
+        pdf.drawString(40, height - 80 - line * 18,
+                       f'{name} ({unit}): {amount}')
+        line += 1
+    pdf.save()
+
+    buffer.seek(0)
+    chunk = buffer.read(SHOPPING_LIST_PDF_CHUNK_SIZE)
+    while chunk:
+        yield chunk
+        chunk = buffer.read(SHOPPING_LIST_PDF_CHUNK_SIZE)
+
 
-def generate_shopping_list(user):
-    shopping_list = ShoppingList.objects.filter(user=user)
-    recipe_id = shopping_list.values_list('recipe', flat=True)
-    recipes = Recipe.objects.filter(id__in=recipe_id)
-    shopping_list_data = {}
-    for recipe in recipes:
-        for ingredient in recipe.ingredients.all():
-            recipe_ingredient = RecipeIngredient.objects.filter(
-                recipe=recipe, ingredient=ingredient).first()
-            recipe_amount = recipe_ingredient.amount
-            recipe_count = recipe.ingredients.count()
-            amount = recipe_amount * recipe_count
-            if ingredient.name in shopping_list_data:
-                shopping_list_data[ingredient.name] += amount
-            else:
-                shopping_list_data[ingredient.name] = amount
-
-        shopping_list_string = ''
-        for name, amount in shopping_list_data.items():
-            shopping_list_string += f'{name}: {amount}\n'
-
-    return shopping_list_string
+SHOPPING_LIST_EXPORTERS = {
+    'txt': stream_shopping_list_txt,
+    'csv': stream_shopping_list_csv,
+    'pdf': stream_shopping_list_pdf,
+}
 
 
 class Base64ImageField(serializers.ImageField):
@@ -0,0 +1,90 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag)
+from users.models import Follow, UserFoodGram
+from .authentication import invalidate_user_tokens
+from .cache import (
+    RECIPES_NAMESPACE,
+    TAGS_NAMESPACE,
+    bump_version,
+    invalidate_user_flags)
+from .images import schedule_renditions
+from .search import ingredient_index
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Перестраивает индекс автодополнения после изменения ингредиентов."""
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    """Запускает построение вариантов нового изображения рецепта."""
+    renditions = instance.image_renditions or {}
+    if instance.image and renditions.get('source') != instance.image.name:
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes_cache(sender, **kwargs):
+    """Сбрасывает кеш ответов со списком и страницами рецептов."""
+    bump_version(RECIPES_NAMESPACE)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_snapshot(sender, **kwargs):
+    """Сдвигает версию справочника тегов."""
+    bump_version(TAGS_NAMESPACE)
+
+
+@receiver(post_save, sender=UserFoodGram)
+@receiver(post_delete, sender=UserFoodGram)
+def invalidate_recipes_cache_on_author(sender, update_fields=None, **kwargs):
+    """Данные автора входят в ответ рецепта, вход в систему не в счёт."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_version(RECIPES_NAMESPACE)
+
+
+@receiver(post_save, sender=UserFoodGram)
+@receiver(post_delete, sender=UserFoodGram)
+def invalidate_user_tokens_on_change(sender, instance, update_fields=None,
+                                     **kwargs):
+    """Смена пароля, блокировка или правка профиля сбрасывают кеш токенов."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Выход из системы (удаление токена в djoser) сбрасывает кеш."""
+    invalidate_user_tokens(instance.user_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_user_flags_cache(sender, instance, **kwargs):
+    """Сбрасывает наборы избранного, корзины и подписок пользователя."""
+    invalidate_user_flags(instance.user_id)
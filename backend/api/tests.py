@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from users.models import UserFoodGram
+from .authentication import CachedTokenAuthentication, TokenLRU
+
+
+@override_settings(AUTH_TOKEN_SHARED_CACHE=True)
+class TokenRevocationTests(TestCase):
+    """Отзыв токена в процессе с собственным кешем токенов."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFoodGram.objects.create(
+            username='token-user', email='token-user@example.com')
+        self.token = Token.objects.create(user=self.user)
+
+    def other_process(self):
+        authentication = CachedTokenAuthentication()
+        authentication.lru = TokenLRU(size=10, ttl=300)
+        return authentication
+
+    def test_cached_token_served_without_queries(self):
+        other = self.other_process()
+        other.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, _ = other.authenticate_credentials(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_revoked_token_rejected_by_other_process(self):
+        key = self.token.key
+        other = self.other_process()
+        other.authenticate_credentials(key)
+
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            other.authenticate_credentials(key)
@@ -2,6 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (
+    DatabasePoolView,
     IngredientViewSet,
     RecipeViewSet,
     TagViewSet
@@ -18,5 +19,6 @@ router.register('ingredients', IngredientViewSet, basename='ingredients')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('health/db-pool/', DatabasePoolView.as_view(), name='db-pool'),
 
 ]
@@ -1,34 +1,108 @@
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 
 from recipes.models import Recipe
+from .cache import invalidate_user_flags
+from .serializers import RecipeIdsSerializer
+
+
+def recipe_pk(pk):
+    """Приводит id рецепта из URL к числу, иначе 404."""
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        raise Http404
 
 
 def shopping_post(request, pk, model, serializer):
     """Добавляем рецепт в список покупок"""
-    recipe = get_object_or_404(Recipe, pk=pk)
-    if model.objects.filter(user=request.user, recipe=recipe).exists():
+    pk = recipe_pk(pk)
+    if not model.objects.add(request.user, [pk]):
+        get_object_or_404(Recipe, pk=pk)
         return Response({'massage': 'Рецепт уже есть в списке покупок'},
                         status=status.HTTP_400_BAD_REQUEST)
-    model.objects.get_or_create(user=request.user, recipe=recipe)
+    invalidate_user_flags(request.user.id)
+    recipe = Recipe.objects.only(
+        'id', 'name', 'image', 'cooking_time').get(pk=pk)
     data = serializer(recipe).data
     return Response(data, status=status.HTTP_201_CREATED)
 
 
 def shopping_delete(request, pk, model):
     """Удаляем рецепт из списка покупко"""
-    recipe = get_object_or_404(Recipe, pk=pk)
-    if model.objects.filter(user=request.user, recipe=recipe).exists():
-        follow = get_object_or_404(model, user=request.user, recipe=recipe)
-        follow.delete()
+    pk = recipe_pk(pk)
+    if model.objects.remove(request.user, [pk]):
+        invalidate_user_flags(request.user.id)
         return Response(
             {'massage': 'Рецепт успешно удален из списка покупок'},
             status=status.HTTP_204_NO_CONTENT)
+    get_object_or_404(Recipe, pk=pk)
     return Response({'message': 'Рецепта нет в списке покупок.'},
                     status=status.HTTP_400_BAD_REQUEST)
 
 
+def toggle_recipes(request, model):
+    """
+    Добавляет (POST) или удаляет (DELETE) сразу несколько рецептов
+    в избранном или списке покупок. Несуществующие рецепты и уже
+    выполненные изменения пропускаются.
+    """
+    serializer = RecipeIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    recipe_ids = serializer.validated_data['recipes']
+    if request.method == 'POST':
+        changed, key = model.objects.add(request.user, recipe_ids), 'added'
+    else:
+        changed, key = model.objects.remove(
+            request.user, recipe_ids), 'removed'
+    if changed:
+        invalidate_user_flags(request.user.id)
+    return Response({key: changed}, status=status.HTTP_200_OK)
+
+
+def get_recipes_limit(request):
+    """Возвращает recipes_limit из запроса или None."""
+    limit = request.query_params.get('recipes_limit', '')
+    return int(limit) if limit.isdigit() else None
+
+
+def prefetch_author_recipes(follows, limit=None):
+    """
+    Загружает последние рецепты авторов из подписок одним запросом.
+
+    При заданном limit рецепты нумеруются оконной функцией
+    ROW_NUMBER() OVER (PARTITION BY author_id) и отбираются
+    первые limit для каждого автора. Результат кладётся
+    в атрибут author_recipes каждой подписки.
+    """
+    author_ids = {follow.following_id for follow in follows}
+    recipes = Recipe.objects.filter(author__in=author_ids).only(
+        'id', 'author_id', 'name', 'image', 'cooking_time', 'pub_date')
+
+    if limit is not None:
+        ranked = recipes.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()]))
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) AS ranked WHERE row_number <= %s '
+            'ORDER BY pub_date DESC, id DESC', (*params, limit))
+
+    by_author = defaultdict(list)
+    for recipe in recipes:
+        by_author[recipe.author_id].append(recipe)
+    for follow in follows:
+        follow.author_recipes = by_author[follow.following_id]
+    return follows
+
+
 def subscrib_post(request, id, model, model_user, serializer):
     """Создает новую подписку"""
 
@@ -45,6 +119,7 @@ def subscrib_post(request, id, model, model_user, serializer):
             status=status.HTTP_400_BAD_REQUEST)
 
     follow = model.objects.create(user=user, following=author)
+    prefetch_author_recipes([follow], get_recipes_limit(request))
     serializer = serializer(follow, context={'request': request})
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
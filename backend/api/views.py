@@ -1,18 +1,29 @@
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import (
+    AllowAny, IsAdminUser, IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from api.pagination import CustomPagination
+from api.pagination import FeedPagination, RecipePagination
 from api.permissions import IsAdminOrAuthor
+from foodgram.db.pool import pool_stats
 from recipes.models import (
+    Favorite,
+    FeedEntry,
     Ingredient,
     Recipe,
+    RecipeIngredient,
     ShoppingList,
     Tag)
+from users.models import Follow, UserFoodGram
 from users.serializers import (
     RecipeFollowSerializer,)
 from .serializers import (
@@ -20,34 +31,82 @@ from .serializers import (
     RecipeChangeSerializer,
     RecipeSerializer,
     TagSerializer,)
-from .service import generate_shopping_list
-from .utils import shopping_delete, shopping_post
-from .filters import RecipeFilter, IngredientFilter
+from .cache import (
+    FEED_PULLED_KEY,
+    INGREDIENTS_NAMESPACE,
+    RECIPES_NAMESPACE,
+    TAGS_NAMESPACE,
+    CatalogueSnapshot,
+    bump_version,
+    get_user_flags,
+    invalidate_user_flags,
+    personalize,
+    request_cache_key)
+from .ingest import ingest_recipes
+from .mixins import ConditionalCatalogueMixin
+from .renderers import (
+    CSVShoppingListRenderer,
+    PDFShoppingListRenderer,
+    TextShoppingListRenderer,)
+from .search import ingredient_index
+from .service import SHOPPING_LIST_EXPORTERS
+from .utils import shopping_delete, shopping_post, toggle_recipes
+from .filters import RecipeFilter
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(ConditionalCatalogueMixin, viewsets.ModelViewSet):
     """
     ViewSet для объектов Ingredient, обеспечивает создание, чтение,
     обновление и удаление объектов,
-    а также поиск по полю "name".
+    а также поиск по полю "name" через индекс в памяти.
+    Чтение поддерживает ETag/Last-Modified по версии каталога.
     """
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
-    filter_backends = (DjangoFilterBackend, )
-    filter_class = IngredientFilter
+    catalogue_namespace = INGREDIENTS_NAMESPACE
 
+    def list(self, request, *args, **kwargs):
+        """Список и автодополнение из индекса в памяти процесса."""
+        return self.conditional_response(
+            lambda request: Response(ingredient_index.search(
+                request.query_params.get('name', ''))), request)
 
-class TagViewSet(viewsets.ModelViewSet):
+
+tags_snapshot = CatalogueSnapshot(
+    TAGS_NAMESPACE,
+    lambda: {tag['id']: tag
+             for tag in TagSerializer(
+                 Tag.objects.order_by('id'), many=True).data})
+
+
+class TagViewSet(ConditionalCatalogueMixin, viewsets.ModelViewSet):
     """
     ViewSet для объектов Tag, обеспечивает создание, чтение, обновление
     и удаление объектов.
+    Чтение идёт из снимка в памяти процесса и поддерживает
+    ETag/Last-Modified по версии справочника.
     """
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
+    catalogue_namespace = TAGS_NAMESPACE
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            lambda request: Response(list(tags_snapshot.get().values())),
+            request)
+
+    def retrieve(self, request, *args, **kwargs):
+        def handler(request, pk=None):
+            tag = tags_snapshot.get().get(int(pk)) if pk.isdigit() else None
+            if tag is None:
+                raise NotFound()
+            return Response(tag)
+
+        return self.conditional_response(handler, request, *args, **kwargs)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -55,22 +114,93 @@ class RecipeViewSet(viewsets.ModelViewSet):
     ViewSet для объектов Recipe, обеспечивает создание, чтение,
     обновление и удаление объектов,
     при условии, что пользователь аутентифицирован.
-    Класс также определяет класс пагинации CustomPagination и
+    Класс также определяет класс пагинации RecipePagination и
     методы обработки запросов HTTP (get, post, patch, delete).
     """
 
     queryset = Recipe.objects.all()
     permission_classes = (IsAdminOrAuthor,)
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     http_method_names = ['get', 'post', 'patch', 'delete']
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilter
 
+    def get_queryset(self):
+        """
+        Возвращает рецепты с аннотированными флагами пользователя.
+
+        is_favorited, is_in_shopping_cart и is_subscribed автора
+        вычисляются подзапросами Exists, а ингредиенты, теги и авторы
+        подгружаются через prefetch_related, поэтому число запросов
+        не зависит от размера страницы.
+        """
+        user = self.request.user
+        authors = UserFoodGram.objects.all()
+
+        if user.is_anonymous:
+            queryset = Recipe.objects.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()))
+            authors = authors.annotate(
+                is_subscribed=Value(False, output_field=BooleanField()))
+        else:
+            queryset = Recipe.objects.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                    user=user, recipe=OuterRef('pk'))))
+            authors = authors.annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, following=OuterRef('pk'))))
+
+        return queryset.prefetch_related(
+            Prefetch('author', queryset=authors),
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient')),
+            'tags')
+
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH', 'DELETE'):
             return RecipeChangeSerializer
         return RecipeSerializer
 
+    def cached_response(self, handler, request, *args, **kwargs):
+        """
+        Отдаёт ответ из общего кеша и накладывает флаги пользователя.
+
+        Ключ строится по нормализованной строке запроса внутри
+        версии пространства recipes, которая сдвигается при любом
+        изменении рецептов, тегов или авторов. Флаги is_favorited,
+        is_in_shopping_cart и is_subscribed берутся из кешированных
+        наборов id пользователя, поэтому тело ответа общее для всех.
+        Выборки по избранному и корзине зависят от пользователя
+        и в общий кеш не попадают.
+        """
+        personal_filters = {'is_favorited', 'is_in_shopping_cart'}
+        if (not request.user.is_anonymous
+                and personal_filters & set(request.query_params)):
+            return handler(request, *args, **kwargs)
+
+        key = request_cache_key(RECIPES_NAMESPACE, request)
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, settings.RECIPES_CACHE_TIMEOUT)
+
+        return Response(personalize(data, get_user_flags(request.user)))
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
@@ -80,6 +210,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        bump_version(RECIPES_NAMESPACE)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        bump_version(RECIPES_NAMESPACE)
 
     @action(detail=True, methods=['post', 'delete'],)
     def favorite(self, request, pk=None):
@@ -92,9 +227,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if request.method == 'POST':
             serializer.add_favorite_user(user)
+            invalidate_user_flags(user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         if request.method == 'DELETE':
             serializer.remove_favorite_user(user)
+            invalidate_user_flags(user.id)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=('post', 'delete'))
@@ -105,16 +242,112 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                  RecipeFollowSerializer)
         return shopping_delete(request, pk, ShoppingList)
 
+    @action(
+        methods=['post', 'delete'], detail=False, url_path='favorite/bulk',
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_bulk(self, request):
+        """Добавление/удаление нескольких рецептов в избранном."""
+        return toggle_recipes(request, Favorite)
+
+    @action(
+        methods=['post', 'delete'], detail=False,
+        url_path='shopping_cart/bulk',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавление/удаление нескольких рецептов в списке покупок."""
+        return toggle_recipes(request, ShoppingList)
+
+    @action(
+        methods=['post'], detail=False,
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk(self, request):
+        """
+        Массовая загрузка рецептов текущего пользователя.
+
+        Тело запроса - рецепты в формате NDJSON, по одному JSON-объекту
+        в строке, с теми же полями, что и при создании рецепта.
+        Результат по каждой строке отдаётся потоком по мере сохранения.
+        Без Content-Length (например, при chunked-передаче) Django не
+        получает тело запроса, такой запрос, как и пустой, отклоняется
+        с 411, а не выглядит загрузкой нуля рецептов.
+        """
+        if request.stream is None:
+            return Response(
+                {'errors': 'Тело запроса пустое или передано без '
+                           'Content-Length (chunked не поддерживается).'},
+                status=status.HTTP_411_LENGTH_REQUIRED)
+        return StreamingHttpResponse(
+            ingest_recipes(request.stream, request.user,
+                           self.get_serializer_context()),
+            content_type='application/x-ndjson')
+
     @action(
         methods=['get'], detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        """
+        Лента рецептов авторов, на которых подписан пользователь.
+
+        Страница выбирается курсором по записям ленты, рецепты
+        популярных авторов подтягиваются в ленту при чтении первой
+        страницы, не чаще раза в FEED_PULL_INTERVAL секунд.
+        """
+        if (FeedPagination.cursor_query_param not in request.query_params
+                and cache.add(FEED_PULLED_KEY.format(request.user.id),
+                              True, settings.FEED_PULL_INTERVAL)):
+            FeedEntry.objects.pull_popular(request.user)
+        entries = self.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user))
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipe_id for entry in entries])
+        serializer = RecipeSerializer(
+            [recipes[entry.recipe_id] for entry in entries
+             if entry.recipe_id in recipes],
+            many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['get'], detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            TextShoppingListRenderer,
+            CSVShoppingListRenderer,
+            PDFShoppingListRenderer),
     )
     def download_shopping_cart(self, request):
-        """Скачивание списка покупок пользователя в виде текстового файла."""
+        """
+        Скачивание списка покупок пользователя.
 
-        user = self.request.user
-        content = generate_shopping_list(user)
-        filename = "foodgram_shoping_cart.txt"
-        response = HttpResponse(content, content_type='text/plain')
+        Формат выбирается параметром ?format= (txt, csv или pdf).
+        txt и csv отдаются потоком по мере чтения строк из базы данных,
+        pdf собирается в памяти целиком и отдаётся частями.
+        """
+
+        renderer = request.accepted_renderer
+        content = SHOPPING_LIST_EXPORTERS[renderer.format](request.user)
+        filename = f'foodgram_shoping_cart.{renderer.format}'
+        response = StreamingHttpResponse(
+            content, content_type=renderer.media_type)
         response['Content-Disposition'] = f'attachment; filename={filename}'
 
         return response
+
+
+class DatabasePoolView(APIView):
+    """
+    Счётчики пулов соединений с базой данных.
+
+    Пулы у каждого процесса свои, поэтому ответ относится к процессу,
+    обработавшему запрос (его pid есть в ответе). По пулу на каждый
+    набор параметров подключения.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(pool_stats())
@@ -0,0 +1,72 @@
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки для больших таблиц.
+
+    Для списка без фильтров берёт оценку числа строк из статистики
+    PostgreSQL (pg_class.reltuples) вместо COUNT(*). Точный COUNT
+    выполняется для отфильтрованных списков и небольших таблиц.
+    """
+
+    exact_count_below = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        model = self.object_list.model
+        with connections[self.object_list.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row is None or row[0] < self.exact_count_below:
+            return super().count
+        return row[0]
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Список без полного COUNT(*) на каждой странице."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Фильтр списка в виде поля ввода.
+
+    Заменяет фильтры по внешним ключам и текстовым полям, которые
+    выводят по варианту на каждое значение в таблице.
+    """
+
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value:
+            return queryset.filter(**{self.lookup: value.strip()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]),
+            'query_params': {
+                key: value for key, value in changelist.params.items()
+                if key != self.parameter_name},
+        }
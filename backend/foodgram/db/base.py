@@ -0,0 +1,48 @@
+from django.db.backends.postgresql import base
+
+from .creation import DatabaseCreation
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд PostgreSQL, берущий соединения из пула процесса.
+
+    Django закрывает соединение в конце запроса (CONN_MAX_AGE = 0) или
+    по истечении CONN_MAX_AGE, вместо закрытия оно возвращается в пул,
+    из которого было взято. При DB_POOL = False бэкенд работает как
+    стандартный.
+    """
+
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, conn_params)
+        if not pool.enabled:
+            self.pool = None
+            return super().get_new_connection(conn_params)
+
+        connection = pool.acquire(
+            lambda: base.Database.connect(**conn_params))
+        self.pool = pool
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        pool, self.pool = self.pool, None
+        with self.wrap_database_errors:
+            pool.release(self.connection)
+        return None
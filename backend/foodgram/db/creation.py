@@ -0,0 +1,25 @@
+from django.db.backends.postgresql import creation
+
+from .pool import close_idle_connections
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """
+    Создание тестовой базы с учётом пула.
+
+    Простаивающие в пуле соединения мешают CREATE DATABASE ... TEMPLATE
+    и DROP DATABASE ("is being accessed by other users"), поэтому перед
+    ними соединения всех пулов процесса закрываются.
+    """
+
+    def _create_test_db(self, *args, **kwargs):
+        close_idle_connections()
+        return super()._create_test_db(*args, **kwargs)
+
+    def _clone_test_db(self, *args, **kwargs):
+        close_idle_connections()
+        return super()._clone_test_db(*args, **kwargs)
+
+    def _destroy_test_db(self, *args, **kwargs):
+        close_idle_connections()
+        return super()._destroy_test_db(*args, **kwargs)
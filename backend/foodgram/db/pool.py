@@ -0,0 +1,283 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from psycopg2 import OperationalError, extensions
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    'checkouts', 'reuses', 'connects', 'waits', 'timeouts',
+    'recycles', 'failed_checks')
+
+
+class ConnectionPool:
+    """
+    Пул соединений psycopg2 одного процесса.
+
+    Соединение берётся из пула вместо нового подключения и
+    возвращается в него вместо закрытия. При выдаче проверяется, что
+    соединение живо (SELECT 1, если оно простаивало дольше
+    check_interval), соединения старше max_lifetime пересоздаются.
+    Одновременно открыто не больше max_size соединений, остальные
+    потоки ждут до timeout секунд.
+
+    Пул обслуживает один набор параметров подключения (database).
+    Выведенный из работы пул (retire) закрывает простаивающие
+    соединения и не принимает возвращаемые.
+    """
+
+    def __init__(self, database, max_size, timeout, max_lifetime,
+                 check_interval):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.enabled = True
+        self.retired = False
+        self._condition = threading.Condition()
+        self._inherited = set()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._created = {}
+        self._size = 0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.wait_time = 0.0
+
+    def _check_pid(self):
+        # После fork соединения родителя принадлежат ему, закрывать их
+        # в дочернем процессе нельзя - их просто забываем.
+        if self._pid != os.getpid():
+            self._inherited = set(self._created)
+            self._reset()
+
+    def acquire(self, connect):
+        """Выдаёт соединение из пула, при необходимости вызывая connect."""
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._condition:
+                self._check_pid()
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    connection = None
+                else:
+                    if not waited:
+                        waited = True
+                        self.counters['waits'] += 1
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        self.counters['timeouts'] += 1
+                        self.wait_time += time.monotonic() - started
+                        raise OperationalError(
+                            f'Нет свободных соединений с базой данных за '
+                            f'{self.timeout} с (пул: {self.max_size}).')
+                    continue
+
+            if connection is None:
+                connection = self._connect(connect)
+                self._checked_out(started, waited, reused=False)
+                return connection
+            if self._usable(connection, last_used):
+                self._checked_out(started, waited, reused=True)
+                return connection
+            self._discard(connection)
+
+    def release(self, connection):
+        """Возвращает соединение в пул или закрывает его."""
+        with self._condition:
+            self._check_pid()
+            if connection in self._inherited:
+                # Соединение родительского процесса: закрытие оборвало
+                # бы его сессию, поэтому соединение просто забываем.
+                self._inherited.discard(connection)
+                logger.debug('Соединение %s открыто до fork, не '
+                             'возвращается в пул', self.database)
+                return
+            known = connection in self._created
+        if not known:
+            logger.warning('Соединение %s выдано не этим пулом, оно '
+                           'закрывается', self.database)
+            try:
+                connection.close()
+            except Exception:
+                pass
+            return
+        if self.retired:
+            self._discard(connection)
+            return
+        if not connection.closed and connection.info.transaction_status != (
+                extensions.TRANSACTION_STATUS_IDLE):
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+        if (connection.closed or connection.info.transaction_status
+                != extensions.TRANSACTION_STATUS_IDLE):
+            self._discard(connection)
+        elif self._expired(connection):
+            self._count('recycles')
+            self._discard(connection)
+        else:
+            with self._condition:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+
+    def stats(self):
+        """Счётчики и текущее состояние пула."""
+        with self._condition:
+            self._check_pid()
+            return {
+                'database': self.database,
+                'pid': self._pid,
+                'enabled': self.enabled,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'wait_time': round(self.wait_time, 6),
+                **self.counters,
+            }
+
+    def close_idle(self):
+        """Закрывает все простаивающие соединения."""
+        with self._condition:
+            self._check_pid()
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def retire(self):
+        """Выводит пул из работы, выданные соединения закроются."""
+        self.retired = True
+        self.close_idle()
+
+    def _connect(self, connect):
+        try:
+            connection = connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created[connection] = time.monotonic()
+            self.counters['connects'] += 1
+        return connection
+
+    def _checked_out(self, started, waited, reused):
+        with self._condition:
+            self.counters['checkouts'] += 1
+            if reused:
+                self.counters['reuses'] += 1
+            if waited:
+                self.wait_time += time.monotonic() - started
+
+    def _count(self, name):
+        with self._condition:
+            self.counters[name] += 1
+
+    def _expired(self, connection):
+        created = self._created.get(connection)
+        return (self.max_lifetime and created is not None
+                and time.monotonic() - created >= self.max_lifetime)
+
+    def _usable(self, connection, last_used):
+        if connection.closed:
+            return False
+        if self._expired(connection):
+            self._count('recycles')
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != (
+                    extensions.TRANSACTION_STATUS_IDLE):
+                connection.rollback()
+        except Exception:
+            self._count('failed_checks')
+            return False
+        return True
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._created.pop(connection, None)
+            self._size -= 1
+            self._condition.notify()
+
+
+_pools = {}
+_alias_keys = {}
+_pools_lock = threading.Lock()
+
+
+def pool_key(conn_params):
+    """Ключ пула: все параметры подключения psycopg2."""
+    return tuple(sorted(
+        (name, str(value)) for name, value in conn_params.items()))
+
+
+def describe(conn_params):
+    return (f"{conn_params.get('user', '')}@{conn_params.get('host', '')}:"
+            f"{conn_params.get('port', '')}/{conn_params.get('database', '')}")
+
+
+def get_pool(alias, conn_params):
+    """
+    Пул соединений для параметров подключения conn_params.
+
+    Пулы различаются всеми параметрами (база, пользователь, хост, порт,
+    OPTIONS). Если параметры псевдонима alias изменились (например,
+    тестовый раннер подменил NAME), прежний пул выводится из работы,
+    когда им больше не пользуется ни один псевдоним.
+    """
+    key = pool_key(conn_params)
+    stale = None
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                database=describe(conn_params),
+                max_size=settings.DB_POOL_MAX_SIZE,
+                timeout=settings.DB_POOL_TIMEOUT,
+                max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+                check_interval=settings.DB_POOL_CHECK_INTERVAL)
+            pool.enabled = settings.DB_POOL
+        previous = _alias_keys.get(alias)
+        _alias_keys[alias] = key
+        if (previous is not None and previous != key
+                and previous not in _alias_keys.values()):
+            stale = _pools.pop(previous, None)
+    if stale is not None:
+        stale.retire()
+    return pool
+
+
+def close_idle_connections():
+    """Закрывает простаивающие соединения всех пулов процесса."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
+
+
+def pool_stats():
+    """Счётчики всех пулов процесса."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
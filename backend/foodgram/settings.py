@@ -20,12 +20,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
-    'api',
+    'api.apps.ApiConfig',
     'django_filters',
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
+    'jobs.apps.JobsConfig',
     'rest_framework.authtoken',
     'djoser',
 ]
@@ -64,22 +66,66 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('ENGINE', default='django.db.backends.postgresql'),
+        'ENGINE': os.getenv('ENGINE', default='foodgram.db'),
         'NAME': os.getenv('DB_NAME', default='postgres'),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='localhost'),
-        'PORT': os.getenv('DB_PORT', default=5432)
+        'PORT': os.getenv('DB_PORT', default=5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=0)),
     }
 }
 
+# Пул соединений бэкенда foodgram.db, отдельный в каждом процессе.
+DB_POOL = os.getenv('DB_POOL', 'True') == 'True'
+
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', default=10))
+
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', default=10))
+
+DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', default=1800))
+
+DB_POOL_CHECK_INTERVAL = float(
+    os.getenv('DB_POOL_CHECK_INTERVAL', default=1))
+
+# Версии пространств кеша (api/cache.py), снимки справочников и индекс
+# ингредиентов сбрасываются через общий кеш. LocMemCache по умолчанию
+# подходит только для одного процесса (runserver): при нескольких
+# воркерах gunicorn или отдельном run_worker остальные процессы его не
+# видят и отдают устаревшие данные до истечения таймаутов. В таких
+# развёртываниях задайте общий кеш, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache и
+# CACHE_LOCATION=memcached:11211 (так настроен infra/docker-compose.yml).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+# Кеши, которые видит только свой процесс.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', default=300))
+
+CATALOGUE_CACHE_MAX_AGE = int(
+    os.getenv('CATALOGUE_CACHE_MAX_AGE', default=3600))
+
+USER_FLAGS_CACHE_TIMEOUT = int(
+    os.getenv('USER_FLAGS_CACHE_TIMEOUT', default=600))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -128,3 +174,52 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentAddressedStorage'
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', default=300))
+
+INGREDIENT_SEARCH_USE_FREQUENCY = os.getenv(
+    'INGREDIENT_SEARCH_USE_FREQUENCY', 'True') == 'True'
+
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv('FEED_FANOUT_MAX_FOLLOWERS', default=1000))
+
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', default=100))
+
+FEED_PULL_INTERVAL = int(os.getenv('FEED_PULL_INTERVAL', default=60))
+
+RECIPE_BULK_BATCH_SIZE = int(os.getenv('RECIPE_BULK_BATCH_SIZE', default=500))
+
+TASKS_EAGER = os.getenv('TASKS_EAGER', 'False') == 'True'
+
+TASKS_CONCURRENCY = int(os.getenv('TASKS_CONCURRENCY', default=2))
+
+TASKS_MAX_ATTEMPTS = int(os.getenv('TASKS_MAX_ATTEMPTS', default=5))
+
+TASKS_RETRY_DELAY = int(os.getenv('TASKS_RETRY_DELAY', default=10))
+
+TASKS_RETRY_MAX_DELAY = int(os.getenv('TASKS_RETRY_MAX_DELAY', default=3600))
+
+TASKS_LOCK_TIMEOUT = int(os.getenv('TASKS_LOCK_TIMEOUT', default=600))
+
+TASKS_POLL_INTERVAL = float(os.getenv('TASKS_POLL_INTERVAL', default=1))
+
+RECIPE_BULK_TOGGLE_LIMIT = int(
+    os.getenv('RECIPE_BULK_TOGGLE_LIMIT', default=200))
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', default=10000))
+
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', default=300))
+
+# С общим кешем отзыв токена (выход, смена пароля) сразу виден всем
+# процессам, без него - только через AUTH_TOKEN_CACHE_TTL. По умолчанию
+# включено, если CACHE_BACKEND общий для процессов.
+AUTH_TOKEN_SHARED_CACHE = os.getenv(
+    'AUTH_TOKEN_SHARED_CACHE',
+    default=str(CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES),
+) == 'True'
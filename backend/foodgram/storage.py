@@ -0,0 +1,85 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+# umask процесса читается один раз: os.umask() меняет его глобально.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, где имя файла - SHA-256 его содержимого.
+
+    Файл upload_to/<имя>.<ext> сохраняется как
+    upload_to/ab/cd/abcd...<ext>: одинаковое содержимое получает
+    одно имя и записывается на диск один раз, а по файлу одного
+    имени всегда лежат одни и те же байты, поэтому его можно отдавать
+    с бессрочным кешированием.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = digest.hexdigest()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def file_mode(self):
+        """
+        Права нового файла: FILE_UPLOAD_PERMISSIONS или, как у обычного
+        open(), 0o666 с учётом umask (mkstemp создаёт файл с 0o600).
+        """
+        if self.file_permissions_mode is not None:
+            return self.file_permissions_mode
+        return 0o666 & ~UMASK
+
+    def _save(self, name, content):
+        """
+        Пишет во временный файл и публикует его жёсткой ссылкой.
+
+        Если тот же файл параллельно сохранил другой процесс,
+        ссылка не создаётся, а временный файл удаляется.
+        """
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temp_path, self.file_mode())
+            try:
+                os.link(temp_path, full_path)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(temp_path)
+        return name
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from foodgram.admin import ScalableAdmin
+from .models import Job
+
+
+class JobAdmin(ScalableAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'created')
+    list_filter = ('status',)
+    ordering = ('-id',)
+    readonly_fields = ('attempts', 'locked_at', 'last_error', 'created')
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,65 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.TASKS_CONCURRENCY,
+            help='Сколько задач выполнять параллельно.')
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread',
+            help='Потоки (для задач с вводом-выводом) или процессы '
+                 '(для задач, нагружающих процессор).')
+        parser.add_argument(
+            '--batch-size', type=int, default=1,
+            help='Сколько задач забирать за один запрос.')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выполнить накопившиеся задачи и завершиться.')
+
+    def handle(self, *args, **options):
+        backend = settings.CACHES['default']['BACKEND']
+        # Сброс версий из воркера (например, после построения вариантов
+        # изображений) через кеш своего процесса не дойдёт до веб-процессов.
+        if backend in settings.PROCESS_LOCAL_CACHES:
+            raise CommandError(
+                f'Кеш {backend} не общий для процессов, веб-процессы не '
+                f'увидят изменений, сделанных задачами. Задайте общий кеш '
+                f'в CACHE_BACKEND и CACHE_LOCATION.')
+
+        if options['pool'] == 'process':
+            stop = multiprocessing.Event()
+            worker_class = multiprocessing.Process
+            # Дочерние процессы открывают собственные соединения.
+            connections.close_all()
+        else:
+            stop = threading.Event()
+            worker_class = threading.Thread
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        workers = [
+            worker_class(target=work, args=(
+                stop, options['batch_size'], options['burst']))
+            for _ in range(max(1, options['concurrency']))]
+        self.stdout.write(
+            f'Воркер запущен: {len(workers)} x {options["pool"]}.')
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.stdout.write('Воркер остановлен.')
@@ -0,0 +1,66 @@
+from django.contrib.postgres.fields import JSONField
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Модель, представляющая отложенную задачу.
+
+    Задачи забирают процессы run_worker через
+    SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько воркеров
+    не получают одну и ту же задачу.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name='Задача',)
+    args = JSONField(
+        verbose_name='Позиционные аргументы',
+        default=list,)
+    kwargs = JSONField(
+        verbose_name='Именованные аргументы',
+        default=dict,)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Статус',)
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток',)
+    max_attempts = models.PositiveIntegerField(
+        verbose_name='Максимум попыток',)
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить не раньше',)
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята воркером',)
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',)
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
@@ -0,0 +1,50 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Имя задачи -> функция.
+TASKS = {}
+
+
+def task(func):
+    """Регистрирует функцию как фоновую задачу под именем module.name."""
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    TASKS[func.task_name] = func
+    return func
+
+
+def run_eagerly(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', func.task_name)
+
+
+def enqueue(func, *args, delay=None, max_attempts=None, **kwargs):
+    """
+    Ставит зарегистрированную задачу в очередь.
+
+    Строка задачи создаётся в текущей транзакции, поэтому воркер
+    увидит её только после фиксации. Аргументы должны сериализоваться
+    в JSON. При TASKS_EAGER задача выполняется в процессе сразу
+    после фиксации транзакции.
+    """
+    if func.task_name not in TASKS:
+        raise ValueError(f'Задача {func.task_name} не зарегистрирована.')
+    if settings.TASKS_EAGER:
+        transaction.on_commit(lambda: run_eagerly(func, args, kwargs))
+        return None
+    run_at = timezone.now()
+    if delay:
+        run_at += timedelta(seconds=delay)
+    return Job.objects.create(
+        name=func.task_name, args=list(args), kwargs=kwargs,
+        run_at=run_at,
+        max_attempts=max_attempts or settings.TASKS_MAX_ATTEMPTS)
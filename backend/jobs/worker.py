@@ -0,0 +1,135 @@
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import TASKS
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором: base * 2^(n-1)."""
+    return min(settings.TASKS_RETRY_MAX_DELAY,
+               settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim(limit=1):
+    """
+    Забирает готовые к запуску задачи.
+
+    Строки блокируются через FOR UPDATE SKIP LOCKED, поэтому
+    параллельные воркеры пропускают чужие задачи, а не ждут их.
+    Выполняющаяся задача продлевает locked_at (Heartbeat), поэтому
+    задача в статусе running без продления дольше TASKS_LOCK_TIMEOUT
+    означает, что воркер упал: она забирается повторно, пока не
+    исчерпаны попытки, а затем помечается failed. Повторный запуск
+    после падения возможен, поэтому задачи должны быть идемпотентны.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    with transaction.atomic():
+        Job.objects.filter(
+            status=Job.RUNNING, locked_at__lt=stale,
+            attempts__gte=F('max_attempts'),
+        ).update(
+            status=Job.FAILED, locked_at=None,
+            last_error='Воркер не завершил задачу за TASKS_LOCK_TIMEOUT, '
+                       'попытки исчерпаны.')
+        jobs = list(Job.objects.select_for_update(skip_locked=True).filter(
+            Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(status=Job.RUNNING, locked_at__lt=stale,
+                attempts__lt=F('max_attempts'))
+        ).order_by('run_at', 'id')[:limit])
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=Job.RUNNING, locked_at=now, attempts=F('attempts') + 1)
+    for job in jobs:
+        job.attempts += 1
+    return jobs
+
+
+class Heartbeat(threading.Thread):
+    """
+    Продлевает locked_at выполняющейся задачи.
+
+    Обновление идёт раз в треть TASKS_LOCK_TIMEOUT из отдельного
+    потока со своим соединением, поэтому долгая задача не считается
+    зависшей и не запускается вторым воркером.
+    """
+
+    def __init__(self, job_id):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.finished = threading.Event()
+
+    def run(self):
+        interval = settings.TASKS_LOCK_TIMEOUT / 3
+        try:
+            while not self.finished.wait(interval):
+                try:
+                    Job.objects.filter(
+                        pk=self.job_id, status=Job.RUNNING).update(
+                            locked_at=timezone.now())
+                except DatabaseError:
+                    logger.warning('Не удалось продлить задачу #%s',
+                                   self.job_id, exc_info=True)
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+def execute(job):
+    """Выполняет задачу: удаляет её при успехе, иначе планирует повтор."""
+    func = TASKS.get(job.name)
+    heartbeat = Heartbeat(job.pk)
+    heartbeat.start()
+    try:
+        if func is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована.')
+        func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s #%s завершилась ошибкой',
+                         job.name, job.pk)
+        if func is not None and job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, locked_at=None, last_error=error,
+                run_at=timezone.now() + timedelta(
+                    seconds=retry_delay(job.attempts)))
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, locked_at=None, last_error=error)
+        return False
+    finally:
+        heartbeat.stop()
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def work(stop, batch_size=1, burst=False):
+    """
+    Цикл воркера: забирает и выполняет задачи, пока не выставлен stop.
+
+    Без задач ждёт TASKS_POLL_INTERVAL секунд, в режиме burst
+    завершается, как только очередь опустела.
+    """
+    try:
+        while not stop.is_set():
+            jobs = claim(batch_size)
+            for job in jobs:
+                execute(job)
+            if not jobs:
+                if burst:
+                    return
+                stop.wait(settings.TASKS_POLL_INTERVAL)
+    finally:
+        connections.close_all()
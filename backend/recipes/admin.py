@@ -1,23 +1,46 @@
 from django.contrib import admin
 
+from foodgram.admin import InputFilter, ScalableAdmin
 from .models import Ingredient, Recipe, RecipeIngredient, Tag
 
 
+class AuthorFilter(InputFilter):
+    title = 'автору'
+    parameter_name = 'author'
+    lookup = 'author__username'
+
+
+class RecipeFilter(InputFilter):
+    title = 'рецепту'
+    parameter_name = 'recipe'
+    lookup = 'recipe_id'
+
+
+class IngredientFilter(InputFilter):
+    title = 'ингредиенту'
+    parameter_name = 'ingredient'
+    lookup = 'ingredient__name__istartswith'
+
+
 class IngredientInline(admin.TabularInline):
     model = Recipe.ingredients.through
+    autocomplete_fields = ('ingredient',)
 
 
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', )
-    list_filter = ('author', 'name', 'tags')
-    ordering = ('name',)
-    search_fields = ('username', 'email', 'first_name', 'last_name',)
+class RecipeAdmin(ScalableAdmin):
+    list_display = ('name', 'author', 'favorites_count', 'pub_date')
+    list_filter = (AuthorFilter, 'tags')
+    list_select_related = ('author',)
+    ordering = ('-pub_date',)
+    search_fields = ('name',)
+    autocomplete_fields = ('author', 'tags')
+    readonly_fields = ('favorites_count', 'shopping_count')
     inlines = [IngredientInline]
 
 
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ScalableAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     search_fields = ('name',)
 
 
@@ -28,10 +51,11 @@ class TagAdmin(admin.ModelAdmin):
     ordering = ('name',)
 
 
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(ScalableAdmin):
     list_display = ('id', 'recipe', 'ingredient', 'amount')
-    search_fields = ('recipe', 'ingredient',)
-    list_filter = ('recipe', 'ingredient',)
+    list_filter = (RecipeFilter, IngredientFilter)
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
 
 
 admin.site.register(Recipe, RecipeAdmin)
@@ -0,0 +1,53 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Follow, UserFoodGram
+from .models import Favorite, Recipe, ShoppingList
+
+# Модель связи -> (модель со счётчиком, поле связи, поле счётчика).
+COUNTERS = {
+    Recipe: (UserFoodGram, 'author_id', 'recipes_count'),
+    Follow: (UserFoodGram, 'following_id', 'followers_count'),
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    ShoppingList: (Recipe, 'recipe_id', 'shopping_count'),
+}
+
+
+def shifted(counter, delta):
+    """
+    Выражение счётчика, сдвинутого на delta, но не ниже нуля.
+
+    Если счётчик уже разошёлся с данными (строки удалены в обход
+    сигналов), уменьшение не нарушает CHECK положительного поля и не
+    срывает удаление связи, расхождение исправляет reconcile.
+    """
+    return Greatest(F(counter) + delta, 0)
+
+
+def change_counter(model, pk, counter, delta):
+    """Атомарно сдвигает счётчик без чтения строки."""
+    model.objects.filter(pk=pk).update(**{counter: shifted(counter, delta)})
+
+
+def actual_count(counted, field):
+    """Подзапрос с фактическим числом связей для строки OuterRef('pk')."""
+    return Coalesce(Subquery(
+        counted.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')), 0)
+
+
+def find_drift(counted):
+    """Возвращает строки (id, сохранено, фактически) с расхождением."""
+    model, field, counter = COUNTERS[counted]
+    return list(model.objects.annotate(
+        actual=actual_count(counted, field)).exclude(
+            **{counter: F('actual')}).values_list('pk', counter, 'actual'))
+
+
+def reconcile(counted, pks=None):
+    """Пересчитывает счётчик по фактическим связям."""
+    model, field, counter = COUNTERS[counted]
+    queryset = model.objects.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+    return queryset.update(**{counter: actual_count(counted, field)})
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe, recipe_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Заполняет поисковые векторы рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько рецептов обновлять за один запрос.')
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать векторы у всех рецептов, а не только пустые.')
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        updated, last_pk = 0, 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).values_list(
+                'pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            updated += Recipe.objects.filter(pk__in=batch).update(
+                search_vector=recipe_search_vector())
+            last_pk = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}.'))
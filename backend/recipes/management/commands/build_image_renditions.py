@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.images import build_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии и превью изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить варианты у всех рецептов, а не только '
+                 'у рецептов без них.')
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.exclude(image='').exclude(
+            image__isnull=True).order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(image_renditions={})
+
+        built = 0
+        for recipe_id in queryset.values_list('pk', flat=True).iterator():
+            try:
+                if build_renditions(recipe_id):
+                    built += 1
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'recipe={recipe_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {built}.'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает агрегированные списки покупок '
+            'с полным пересчётом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя, можно указать несколько раз.')
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересчитать списки покупок с расхождениями.')
+
+    def handle(self, *args, **options):
+        mismatches = ShoppingCartIngredient.objects.find_mismatches(
+            options['users'])
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        for user_id, ingredient_id, stored, expected in mismatches:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'в таблице {stored}, ожидается {expected}')
+
+        if options['fix']:
+            ShoppingCartIngredient.objects.rebuild(
+                {user_id for user_id, *_ in mismatches})
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок пересчитаны.'))
+            return
+
+        raise CommandError(f'Найдено расхождений: {len(mismatches)}.')
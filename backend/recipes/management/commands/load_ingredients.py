@@ -0,0 +1,174 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.search import ingredient_index
+from recipes.models import Ingredient
+
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+JSON_READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Строки CSV вида "название,единица измерения" без заголовка."""
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def iter_json_array(file):
+    """Элементы JSON-массива верхнего уровня без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer, position, started = '', 0, False
+    while True:
+        chunk = file.read(JSON_READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started:
+                if position == len(buffer):
+                    break
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив.')
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break
+            yield item
+        if not chunk:
+            raise CommandError('Некорректный JSON: массив не закрыт.')
+
+
+def read_json(file):
+    """
+    Элементы {"name", "measurement_unit"}, в том числе в формате
+    фикстуры Django ({"model", "pk", "fields": {...}}).
+
+    Вместо элемента, который не является объектом, отдаётся None.
+    """
+    for item in iter_json_array(file):
+        fields = item.get('fields', item) if isinstance(item, dict) else None
+        if not isinstance(fields, dict):
+            yield None
+            continue
+        yield fields.get('name', ''), fields.get('measurement_unit', '')
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из CSV или JSON. Существующие '
+            'ингредиенты пропускаются, повторный запуск ничего не меняет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с ингредиентами (.csv или .json).')
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла, по умолчанию по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Сколько строк вставлять за один запрос.')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY, вставлять через bulk_create.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path)[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+
+        self.skipped = 0
+        use_copy = connection.vendor == 'postgresql' and not options[
+            'no_copy']
+        load = self.copy_batch if use_copy else self.insert_batch
+        before = Ingredient.objects.count()
+        valid = 0
+        try:
+            with open(path, encoding='utf-8', newline='') as file, \
+                    transaction.atomic():
+                if use_copy:
+                    self.create_staging()
+                rows = self.clean(READERS[file_format](file))
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    valid += len(batch)
+                    load(batch)
+                if use_copy:
+                    self.merge_staging()
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+
+        added = Ingredient.objects.count() - before
+        if added:
+            ingredient_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано: {valid + self.skipped}, добавлено: {added}, '
+            f'не вставлено (уже были или повторы в файле): '
+            f'{valid - added}, '
+            f'пропущено: {self.skipped}.'))
+
+    def clean(self, rows):
+        for number, row in enumerate(rows, start=1):
+            if row is None or not all(
+                    isinstance(value, str) for value in row):
+                self.skipped += 1
+                self.stderr.write(self.style.WARNING(
+                    f'Элемент {number} пропущен: ожидается объект '
+                    f'с текстовыми name и measurement_unit.'))
+                continue
+            name, unit = row
+            name, unit = name.strip(), unit.strip()
+            if (not name or not unit or len(name) > NAME_LENGTH
+                    or len(unit) > UNIT_LENGTH):
+                self.skipped += 1
+                continue
+            yield name, unit
+
+    def insert_batch(self, batch):
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in batch],
+            ignore_conflicts=True)
+
+    def create_staging(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_staging '
+                '(name text, measurement_unit text) ON COMMIT DROP')
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                'COPY ingredient_staging (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)', buffer)
+
+    def merge_staging(self):
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_staging '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING')
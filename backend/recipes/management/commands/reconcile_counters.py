@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import COUNTERS, find_drift, reconcile
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики подписчиков, рецептов, избранного '
+            'и списков покупок с фактическими связями и исправляет '
+            'расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не менять.')
+
+    def handle(self, *args, **options):
+        total = 0
+        for counted, (model, _, counter) in COUNTERS.items():
+            drift = find_drift(counted)
+            total += len(drift)
+            for pk, stored, actual in drift:
+                self.stdout.write(
+                    f'{model._meta.model_name}={pk} {counter}: '
+                    f'сохранено {stored}, фактически {actual}')
+            if drift and not options['dry_run']:
+                reconcile(counted, [pk for pk, *_ in drift])
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+        elif options['dry_run']:
+            self.stdout.write(f'Найдено расхождений: {total}.')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено счётчиков: {total}.'))
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:55
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_tag_ids(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    tag_ids = defaultdict(list)
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id').order_by('tag_id').iterator():
+        tag_ids[recipe_id].append(tag_id)
+    for recipe_id, ids in tag_ids.items():
+        Recipe.objects.filter(pk=recipe_id).update(tag_ids=ids)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_auto_20261018_2050'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, help_text='Копия связи tags для фильтрации без JOIN', size=None, verbose_name='id тегов'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='recipe_tag_ids_idx'),
+        ),
+        migrations.RunPython(fill_tag_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:04
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_auto_20261018_2059'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, editable=False, help_text='Пути уменьшенных копий и размытое превью', verbose_name='Варианты изображения'),
+        ),
+    ]
@@ -1,8 +1,27 @@
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator, MinLengthValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Sum
+from django.db.models.functions import Greatest
 
 from users.models import UserFoodGram
 
+SEARCH_CONFIG = 'russian'
+
+
+def recipe_search_vector():
+    """
+    Выражение поискового вектора рецепта.
+
+    Совпадает с триггером recipes_recipe_search_vector_update,
+    название весит больше описания.
+    """
+    return (SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG))
+
 
 class Ingredient(models.Model):
     """Модель, представляющая ингредиент для рецепта."""
@@ -101,15 +120,59 @@ class Recipe(models.Model):
         verbose_name='Дата публикации рецепта',
         auto_now_add=True,
         db_index=True,)
+    tag_ids = ArrayField(
+        models.IntegerField(),
+        verbose_name='id тегов',
+        help_text='Копия связи tags для фильтрации без JOIN',
+        default=list,
+        blank=True,
+        editable=False,)
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,)
+    image_renditions = JSONField(
+        verbose_name='Варианты изображения',
+        help_text='Пути уменьшенных копий и размытое превью',
+        default=dict,
+        blank=True,
+        editable=False,)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном у пользователей',
+        default=0,
+        editable=False,)
+    shopping_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок у пользователей',
+        default=0,
+        editable=False,)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            GinIndex(fields=['search_vector'],
+                     name='recipe_search_vector_idx'),
+            GinIndex(fields=['tag_ids'], name='recipe_tag_ids_idx'),
+            GinIndex(fields=['name'], name='recipe_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def sync_tag_ids(cls, recipe_ids):
+        """Переписывает tag_ids рецептов по текущей связи tags."""
+        tag_ids = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, tag_id in cls.tags.through.objects.filter(
+                recipe_id__in=tag_ids).values_list(
+                    'recipe_id', 'tag_id').order_by('tag_id'):
+            tag_ids[recipe_id].append(tag_id)
+        for recipe_id, ids in tag_ids.items():
+            cls.objects.filter(pk=recipe_id).update(tag_ids=ids)
+        return tag_ids
+
 
 class RecipeIngredient(models.Model):
     """
@@ -144,6 +207,71 @@ class RecipeIngredient(models.Model):
             f"({self.amount})")
 
 
+class UserRecipeManager(models.Manager):
+    """
+    Добавление и удаление связей пользователь-рецепт одним запросом.
+
+    INSERT ... ON CONFLICT DO NOTHING и DELETE ... RETURNING не гоняются
+    между проверкой и записью и возвращают id рецептов, которые
+    действительно изменились. Сигналы при этом не отправляются,
+    поэтому счётчик рецепта сдвигается здесь же. Поле счётчика задаёт
+    наследник в атрибуте counter: Django создаёт менеджеры обратных
+    связей без аргументов.
+    """
+
+    counter = None
+
+    def add(self, user, recipe_ids):
+        """Добавляет рецепты, возвращает id добавленных."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.model._meta.db_table} '
+                '(user_id, recipe_id) '
+                f'SELECT %s, id FROM {Recipe._meta.db_table} '
+                'WHERE id = ANY(%s) '
+                'ON CONFLICT DO NOTHING RETURNING recipe_id',
+                [user.id, list(recipe_ids)])
+            added = [recipe_id for recipe_id, in cursor.fetchall()]
+            self.changed(user, added, 1)
+        return added
+
+    def remove(self, user, recipe_ids):
+        """Удаляет рецепты, возвращает id удалённых."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.model._meta.db_table} '
+                'WHERE user_id = %s AND recipe_id = ANY(%s) '
+                'RETURNING recipe_id',
+                [user.id, list(recipe_ids)])
+            removed = [recipe_id for recipe_id, in cursor.fetchall()]
+            self.changed(user, removed, -1)
+        return removed
+
+    def changed(self, user, recipe_ids, delta):
+        if recipe_ids:
+            Recipe.objects.filter(pk__in=recipe_ids).update(
+                **{self.counter: Greatest(
+                    models.F(self.counter) + delta, 0)})
+
+
+class FavoriteManager(UserRecipeManager):
+    counter = 'favorites_count'
+
+
+class ShoppingListManager(UserRecipeManager):
+    """Вдобавок переносит изменения корзины в агрегат списка покупок."""
+
+    counter = 'shopping_count'
+
+    def changed(self, user, recipe_ids, delta):
+        super().changed(user, recipe_ids, delta)
+        if recipe_ids:
+            ShoppingCartIngredient.objects.apply_deltas([user.id], {
+                ingredient_id: delta * amount
+                for ingredient_id, amount in ShoppingCartIngredient.objects
+                .recipes_amounts(recipe_ids).items()})
+
+
 class Favorite(models.Model):
     """Модель, представляющая рецепт, добавленный в избранное пользователем."""
 
@@ -154,6 +282,8 @@ class Favorite(models.Model):
         Recipe,
         on_delete=models.CASCADE,)
 
+    objects = FavoriteManager()
+
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -178,6 +308,8 @@ class ShoppingList(models.Model):
         Recipe,
         on_delete=models.CASCADE,)
 
+    objects = ShoppingListManager()
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
@@ -190,3 +322,285 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в список покупок'
+
+
+class ShoppingCartIngredientManager(models.Manager):
+    """
+    Инкрементально поддерживает агрегат списка покупок.
+
+    Каждое изменение корзины превращается в набор приращений
+    {ingredient_id: amount}, которые применяются к строкам пользователей.
+    """
+
+    AMOUNT_EPSILON = 1e-6
+
+    def apply_deltas(self, user_ids, deltas):
+        """
+        Прибавляет приращения к строкам пользователей.
+
+        Одним INSERT ... ON CONFLICT DO UPDATE: параллельные изменения
+        одной строки не падают на unique_cart_ingredient, а строки
+        блокируются в порядке (user_id, ingredient_id), поэтому
+        пересекающиеся изменения не взаимоблокируются. Строки,
+        опустившиеся до нуля, удаляются следом.
+        """
+        user_ids = sorted(set(user_ids))
+        deltas = {key: value for key, value in deltas.items() if value}
+        if not user_ids or not deltas:
+            return
+
+        ingredient_ids = sorted(deltas)
+        table = self.model._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                'SELECT users.id, deltas.ingredient_id, deltas.amount '
+                'FROM unnest(%s::integer[]) AS users(id) '
+                'CROSS JOIN unnest(%s::integer[], %s::double precision[]) '
+                'AS deltas(ingredient_id, amount) '
+                'ORDER BY users.id, deltas.ingredient_id '
+                'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {table}.amount + EXCLUDED.amount',
+                [user_ids, ingredient_ids,
+                 [float(deltas[key]) for key in ingredient_ids]])
+            cursor.execute(
+                f'DELETE FROM {table} '
+                'WHERE user_id = ANY(%s) AND ingredient_id = ANY(%s) '
+                'AND amount <= %s',
+                [user_ids, ingredient_ids, self.AMOUNT_EPSILON])
+
+    @staticmethod
+    def recipe_amounts(recipe):
+        return dict(RecipeIngredient.objects.filter(
+            recipe=recipe).values_list('ingredient_id', 'amount'))
+
+    @staticmethod
+    def recipes_amounts(recipe_ids):
+        """Суммарные количества ингредиентов нескольких рецептов."""
+        return dict(RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids).values('ingredient_id').annotate(
+                total=Sum('amount')).values_list('ingredient_id', 'total'))
+
+    def add_recipe(self, user, recipe):
+        self.apply_deltas([user.id], self.recipe_amounts(recipe))
+
+    def remove_recipe(self, user, recipe):
+        self.apply_deltas([user.id], {
+            ingredient_id: -amount
+            for ingredient_id, amount in self.recipe_amounts(recipe).items()})
+
+    def discard_recipe(self, recipe):
+        """Вычитает рецепт из всех корзин, где он есть."""
+        users = ShoppingList.objects.filter(
+            recipe=recipe).values_list('user_id', flat=True)
+        self.apply_deltas(users, {
+            ingredient_id: -amount
+            for ingredient_id, amount in self.recipe_amounts(recipe).items()})
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Переносит изменение состава рецепта во все корзины с ним."""
+        deltas = {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in set(old_amounts) | set(new_amounts)}
+        users = ShoppingList.objects.filter(
+            recipe=recipe).values_list('user_id', flat=True)
+        self.apply_deltas(users, deltas)
+
+    @staticmethod
+    def compute_totals(users=None):
+        """Полный пересчёт агрегата по ShoppingList и RecipeIngredient."""
+        if users is None:
+            queryset = RecipeIngredient.objects.filter(
+                recipe__shoppinglist__isnull=False)
+        else:
+            queryset = RecipeIngredient.objects.filter(
+                recipe__shoppinglist__user__in=users)
+        return queryset.values(
+            'recipe__shoppinglist__user', 'ingredient'
+        ).annotate(total_amount=Sum('amount')).order_by()
+
+    def rebuild(self, users=None):
+        with transaction.atomic():
+            rows = self.all()
+            if users is not None:
+                rows = rows.filter(user__in=users)
+            rows.delete()
+            self.bulk_create(
+                (self.model(user_id=item['recipe__shoppinglist__user'],
+                            ingredient_id=item['ingredient'],
+                            amount=item['total_amount'])
+                 for item in self.compute_totals(users).iterator()),
+                batch_size=1000)
+
+    def find_mismatches(self, users=None):
+        """
+        Сравнивает таблицу с полным пересчётом.
+
+        Возвращает список (user_id, ingredient_id, в таблице, ожидается).
+        """
+        expected = {
+            (item['recipe__shoppinglist__user'], item['ingredient']):
+                item['total_amount']
+            for item in self.compute_totals(users).iterator()}
+        rows = self.all()
+        if users is not None:
+            rows = rows.filter(user__in=users)
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in rows.values_list(
+                'user_id', 'ingredient_id', 'amount').iterator()}
+
+        mismatches = []
+        for key in set(expected) | set(actual):
+            stored, total = actual.get(key, 0), expected.get(key, 0)
+            if abs(stored - total) > self.AMOUNT_EPSILON:
+                mismatches.append((*key, stored, total))
+        return sorted(mismatches)
+
+
+class ShoppingCartIngredient(models.Model):
+    """
+    Модель, представляющая суммарное количество ингредиента
+    в списке покупок пользователя.
+
+    Обновляется при изменении списка покупок и состава рецептов,
+    чтобы выгрузка списка не пересчитывала его целиком.
+    """
+
+    user = models.ForeignKey(
+        UserFoodGram,
+        related_name='cart_ingredients',
+        on_delete=models.CASCADE,)
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,)
+    amount = models.FloatField(
+        verbose_name='Суммарное количество ингредиента',)
+
+    objects = ShoppingCartIngredientManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_cart_ingredient',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} ({self.amount})'
+
+
+class FeedEntryManager(models.Manager):
+    """
+    Лента рецептов авторов, на которых подписан пользователь.
+
+    Новый рецепт раскладывается по лентам подписчиков при публикации.
+    Авторы с числом подписчиков больше FEED_FANOUT_MAX_FOLLOWERS при
+    публикации пропускаются: их рецепты подтягиваются в ленту
+    читателя при её чтении.
+    """
+
+    BATCH_SIZE = 1000
+
+    def _entries(self, user_ids, recipes):
+        return [
+            self.model(user_id=user_id, recipe_id=recipe.id,
+                       author_id=recipe.author_id, pub_date=recipe.pub_date)
+            for user_id in user_ids for recipe in recipes
+        ]
+
+    def fan_out(self, author_id, recipes):
+        """Добавляет новые рецепты автора в ленты его подписчиков."""
+        from users.models import Follow
+
+        followers = Follow.objects.filter(
+            following_id=author_id).values_list('user_id', flat=True)
+        if followers[settings.FEED_FANOUT_MAX_FOLLOWERS:].exists():
+            return
+        self.bulk_create(
+            self._entries(followers, recipes),
+            batch_size=self.BATCH_SIZE, ignore_conflicts=True)
+
+    def backfill(self, user_id, author_id):
+        """Заполняет ленту последними рецептами нового автора."""
+        recipes = Recipe.objects.filter(author_id=author_id).only(
+            'id', 'author_id', 'pub_date').order_by(
+                '-pub_date', '-id')[:settings.FEED_BACKFILL_SIZE]
+        self.bulk_create(
+            self._entries([user_id], recipes), ignore_conflicts=True)
+
+    def remove_author(self, user_id, author_id):
+        """Убирает из ленты рецепты автора после отписки."""
+        self.filter(user_id=user_id, author_id=author_id).delete()
+
+    def pull_popular(self, user):
+        """
+        Подтягивает в ленту пользователя рецепты популярных авторов,
+        опубликованные после последней такой записи в ленте.
+        """
+        from users.models import Follow
+
+        authors = list(Follow.objects.filter(
+            user=user,
+            following__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('following_id', flat=True))
+        if not authors:
+            return
+        recipes = Recipe.objects.filter(author_id__in=authors)
+        latest = self.filter(user=user, author_id__in=authors).aggregate(
+            latest=models.Max('pub_date'))['latest']
+        if latest is not None:
+            recipes = recipes.filter(pub_date__gt=latest)
+        recipes = recipes.only('id', 'author_id', 'pub_date').order_by(
+            '-pub_date', '-id')[:settings.FEED_BACKFILL_SIZE]
+        self.bulk_create(
+            self._entries([user.id], recipes), ignore_conflicts=True)
+
+
+class FeedEntry(models.Model):
+    """
+    Модель, представляющая рецепт в ленте подписок пользователя.
+
+    Дата публикации и автор скопированы из рецепта, чтобы лента
+    читалась по одному индексу (user, pub_date, recipe).
+    """
+
+    user = models.ForeignKey(
+        UserFoodGram,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,)
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,)
+    author = models.ForeignKey(
+        UserFoodGram,
+        related_name='+',
+        on_delete=models.CASCADE,)
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',)
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feed_entry_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_entry_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
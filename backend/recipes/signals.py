@@ -0,0 +1,73 @@
+from django.db.models import F, Func, Value
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from jobs.registry import enqueue
+from users.models import Follow
+from .counters import COUNTERS, change_counter
+from .models import FeedEntry, Recipe, ShoppingCartIngredient, Tag
+from .tasks import fan_out_recipes
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_carts(sender, instance, **kwargs):
+    """Вычитает удаляемый рецепт из агрегатов списков покупок."""
+    ShoppingCartIngredient.objects.discard_recipe(instance)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def sync_recipe_tag_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    """Поддерживает Recipe.tag_ids в соответствии со связью tags."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.tag_ids = Recipe.sync_tag_ids([instance.pk])[instance.pk]
+    elif pk_set:
+        Recipe.sync_tag_ids(pk_set)
+    elif action == 'post_clear':
+        Recipe.objects.filter(tag_ids__contains=[instance.pk]).update(
+            tag_ids=Func(F('tag_ids'), Value(instance.pk),
+                         function='array_remove'))
+
+
+@receiver(post_delete, sender=Tag)
+def remove_deleted_tag_ids(sender, instance, **kwargs):
+    Recipe.objects.filter(tag_ids__contains=[instance.pk]).update(
+        tag_ids=Func(F('tag_ids'), Value(instance.pk),
+                     function='array_remove'))
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+    if created:
+        enqueue(fan_out_recipes, instance.author_id, [instance.pk])
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.backfill(instance.user_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_feed(sender, instance, **kwargs):
+    FeedEntry.objects.remove_author(instance.user_id, instance.following_id)
+
+
+def update_counter(sender, instance, created=True, **kwargs):
+    """Сдвигает денормализованный счётчик при создании/удалении связи."""
+    if kwargs['signal'] is post_delete:
+        delta = -1
+    elif created:
+        delta = 1
+    else:
+        return
+    model, field, counter = COUNTERS[sender]
+    change_counter(model, getattr(instance, field), counter, delta)
+
+
+for counted in COUNTERS:
+    post_save.connect(update_counter, sender=counted)
+    post_delete.connect(update_counter, sender=counted)
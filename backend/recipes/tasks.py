@@ -0,0 +1,10 @@
+from jobs.registry import task
+from .models import FeedEntry, Recipe
+
+
+@task
+def fan_out_recipes(author_id, recipe_ids):
+    """Раскладывает новые рецепты автора по лентам подписчиков."""
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).only(
+        'id', 'author_id', 'pub_date')
+    FeedEntry.objects.fan_out(author_id, recipes)
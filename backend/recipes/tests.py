@@ -0,0 +1,104 @@
+import threading
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from users.models import Follow, UserFoodGram
+from .models import Favorite, Ingredient, Recipe, ShoppingCartIngredient
+
+
+class ApplyDeltasConcurrencyTests(TransactionTestCase):
+    """Параллельные изменения одной строки агрегата списка покупок."""
+
+    rounds = 10
+
+    def setUp(self):
+        self.user = UserFoodGram.objects.create(
+            username='cart-user', email='cart-user@example.com')
+
+    def run_concurrently(self, *deltas):
+        barrier = threading.Barrier(len(deltas))
+        errors = []
+
+        def worker(delta):
+            try:
+                barrier.wait()
+                ShoppingCartIngredient.objects.apply_deltas(
+                    [self.user.id], delta)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(delta,))
+                   for delta in deltas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def amounts(self, *ingredients):
+        return [
+            ShoppingCartIngredient.objects.get(
+                user=self.user, ingredient=ingredient).amount
+            for ingredient in ingredients]
+
+    def test_missing_row_added_concurrently(self):
+        for number in range(self.rounds):
+            ingredient = Ingredient.objects.create(
+                name=f'Мука {number}', measurement_unit='г')
+            self.run_concurrently(
+                {ingredient.id: 100}, {ingredient.id: 50})
+            self.assertEqual(self.amounts(ingredient), [150])
+
+    def test_overlapping_rows_in_opposite_order(self):
+        for number in range(self.rounds):
+            first = Ingredient.objects.create(
+                name=f'Соль {number}', measurement_unit='г')
+            second = Ingredient.objects.create(
+                name=f'Сахар {number}', measurement_unit='г')
+            self.run_concurrently(
+                {first.id: 1, second.id: 2}, {second.id: 3, first.id: 4})
+            self.assertEqual(self.amounts(first, second), [5, 5])
+
+    def test_row_removed_when_amount_reaches_zero(self):
+        ingredient = Ingredient.objects.create(
+            name='Перец', measurement_unit='г')
+        ShoppingCartIngredient.objects.apply_deltas(
+            [self.user.id], {ingredient.id: 10})
+        self.run_concurrently({ingredient.id: -4}, {ingredient.id: -6})
+        self.assertFalse(ShoppingCartIngredient.objects.filter(
+            user=self.user, ingredient=ingredient).exists())
+
+
+class CounterClampTests(TestCase):
+    """Уменьшение счётчика, уже разошедшегося с данными."""
+
+    def setUp(self):
+        self.author = UserFoodGram.objects.create(
+            username='author', email='author@example.com')
+        self.user = UserFoodGram.objects.create(
+            username='reader', email='reader@example.com')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Суп', text='Описание',
+            cooking_time=10, image='recipes/soup.jpg')
+
+    def test_unfavorite_with_counter_at_zero(self):
+        favorite = Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=0)
+
+        favorite.delete()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_unfollow_with_counter_at_zero(self):
+        follow = Follow.objects.create(user=self.user, following=self.author)
+        UserFoodGram.objects.filter(pk=self.author.pk).update(
+            followers_count=0)
+
+        follow.delete()
+
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
@@ -1,18 +1,14 @@
 from django.contrib import admin
 
-from .models import UserFoodGram, Follow
+from foodgram.admin import ScalableAdmin
+from .models import UserFoodGram
 
 
-class UserFoodGramAdmin(admin.ModelAdmin):
-    list_filter = ('email', 'username')
+class UserFoodGramAdmin(ScalableAdmin):
+    list_filter = ('is_staff', 'is_active')
     list_display = ('email', 'username', 'followers_count', 'recipes_count')
     readonly_fields = ('followers_count', 'recipes_count')
-
-    def followers_count(self, obj):
-        return Follow.objects.filter(following=obj).count()
-
-    def recipes_count(self, obj):
-        return obj.recipes.count()
+    search_fields = ('^username', '=email')
 
 
 admin.site.register(UserFoodGram, UserFoodGramAdmin)
@@ -14,6 +14,10 @@ class UserFoodGram(AbstractUser):
     last_name = models.CharField(
         max_length=150, verbose_name='Фамилия пользователя')
     password = models.CharField(max_length=128)
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число подписчиков')
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число рецептов')
 
     class Meta:
         verbose_name = 'Пользователь'
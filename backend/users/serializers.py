@@ -14,6 +14,9 @@ class CustomUserSerializer(serializers.ModelSerializer):
     )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+
         if self.context['request'].user.is_anonymous:
             return False
 
@@ -42,16 +45,11 @@ class RecipeFollowSerializer(serializers.ModelSerializer):
             user=user, recipe=self.instance).exists()
 
     def add_favorite_user(self, user):
-        favorite, created = Favorite.objects.get_or_create(
-            user=user, recipe=self.instance)
-        if not created:
+        if not Favorite.objects.add(user, [self.instance.pk]):
             raise serializers.ValidationError('Рецепт уже в избранном')
 
     def remove_favorite_user(self, user):
-        favorite = Favorite.objects.filter(user=user, recipe=self.instance)
-        if favorite:
-            favorite.delete()
-        else:
+        if not Favorite.objects.remove(user, [self.instance.pk]):
             raise serializers.ValidationError('Рецепта нет в избранном')
 
     def validate(self, data):
@@ -80,22 +78,26 @@ class FollowSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed')
     recipes = serializers.SerializerMethodField(method_name='get_recipes')
-    recipes_count = serializers.ReadOnlyField(source='following.recipes.count')
+    recipes_count = serializers.SerializerMethodField(
+        method_name='get_recipes_count')
 
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(
-            user=obj.user,
-            following=obj.following
-        ).exists()
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.following)
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(obj, 'author_recipes'):
+            queryset = obj.author_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit', '')
+            queryset = Recipe.objects.filter(author=obj.following)
+            if limit.isdigit():
+                queryset = queryset[:int(limit)]
         return RecipeFollowSerializer(queryset, many=True).data
 
+    def get_recipes_count(self, obj):
+        return obj.following.recipes_count
+
     class Meta:
         model = Follow
         fields = (
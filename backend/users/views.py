@@ -5,8 +5,12 @@ from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
-from api.pagination import CustomPagination
-from api.utils import subscrib_delete, subscrib_post
+from api.pagination import FollowPagination, UserPagination
+from api.utils import (
+    get_recipes_limit,
+    prefetch_author_recipes,
+    subscrib_delete,
+    subscrib_post)
 from .models import Follow, UserFoodGram
 from .serializers import CustomUserSerializer, FollowSerializer
 
@@ -15,7 +19,7 @@ class CustomUserViewSet(UserViewSet):
     """ViewSet для работы с пользователями сервиса FoodGram."""
     permission_classes = (IsAuthenticatedOrReadOnly,)
     queryset = UserFoodGram.objects.all().order_by('-date_joined')
-    pagination_class = CustomPagination
+    pagination_class = UserPagination
 
     @action(
         methods=['get', 'patch'],
@@ -51,24 +55,21 @@ class CustomUserViewSet(UserViewSet):
     @action(
         methods=['get'],
         detail=False,
-        permission_classes=(IsAuthenticated,),)
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FollowPagination,)
     def subscriptions(self, request):
         """
         Возвращает список пользователей, на которых
         подписан текущий пользователь.
         """
         user = request.user
-        queryset = Follow.objects.filter(user=user)
+        queryset = Follow.objects.filter(user=user).select_related(
+            'following')
         pages = self.paginate_queryset(queryset)
+        prefetch_author_recipes(pages, get_recipes_limit(request))
         serializer = FollowSerializer(
             pages,
             many=True,
             context={'request': request}
         )
-
-        response_data = {
-            'count': len(pages),
-            'next': self.paginator.get_next_link(),
-            'previous': self.paginator.get_previous_link(),
-            'results': serializer.data}
-        return Response(response_data)
+        return self.get_paginated_response(serializer.data)